@@ -0,0 +1,200 @@
+"""
+as-of and interval joins on sorted keys
+    "latest row in flux_b with date <= row_a.date, per name"
+
+    * both inputs must already be sorted on their join columns,
+      eg flux_a.sort('date'), flux_b.sort('date')
+    * a single merge pass over both inputs: O(n + m) for as-of joins,
+      instead of a bisect per row over .map_rows_append() groups
+    * yields (row_a, row_b) pairs in flux_a order, like flux_a.join()
+    * column arguments: 'date' when the names are the same in both,
+      or {'date_a': 'date_b'}, same as the flux_a.join() mapping
+"""
+import heapq
+
+from root.examples.flux_columns import column_index
+from root.examples.flux_columns import key_function
+from root.examples.flux_views import row_view_cls
+
+
+def __column_pair(columns):
+    """ 'date' -> ('date', 'date'),  {'date_a': 'date_b'} -> ('date_a', 'date_b') """
+    if isinstance(columns, dict):
+        if len(columns) != 1:
+            raise ValueError('expected a single {column_a: column_b} mapping')
+        return next(iter(columns.items()))
+
+    return columns, columns
+
+
+def __key_pair(flux_a, flux_b, by):
+    """ by: None, 'name', ('name', 'id') or {'name_a': 'name_b', ...} """
+    if by is None:
+        return key_function(flux_a, None), key_function(flux_b, None)
+
+    if isinstance(by, dict):
+        cols_a, cols_b = list(by.keys()), list(by.values())
+    elif isinstance(by, (str, int)):
+        cols_a = cols_b = [by]
+    else:
+        cols_a = cols_b = list(by)
+
+    return key_function(flux_a, cols_a), key_function(flux_b, cols_b)
+
+
+def __unsorted_error(flux_name, column):
+    return ValueError("{} must be sorted on '{}' (ascending) for a merge join".format(flux_name, column))
+
+
+def __merge_asof(rows_a, rows_b, on_a, i_a, i_b, key_a, key_b, strictly, forward):
+    """ {position in rows_a: row_b}, one pass in either direction """
+    if forward:
+        def reached(v_b, v_a):
+            return v_b > v_a if strictly else v_b >= v_a
+        positions = range(len(rows_a) - 1, -1, -1)
+        rows_b    = reversed(rows_b)
+    else:
+        def reached(v_b, v_a):
+            return v_b < v_a if strictly else v_b <= v_a
+        positions = range(len(rows_a))
+        rows_b    = iter(rows_b)
+
+    matched = {}
+    latest  = {}
+    row_b   = next(rows_b, None)
+    v_prev  = None
+    for p in positions:
+        row_a = rows_a[p]
+        v_a   = row_a.values[i_a]
+
+        if v_prev is not None and ((v_a > v_prev) if forward else (v_a < v_prev)):
+            raise __unsorted_error('flux_a', on_a)
+        v_prev = v_a
+
+        while row_b is not None and reached(row_b.values[i_b], v_a):
+            latest[key_b(row_b.values)] = row_b
+            row_b = next(rows_b, None)
+
+        candidate = latest.get(key_a(row_a.values))
+        if candidate is not None:
+            matched[p] = candidate
+
+    return matched
+
+
+def join_asof(flux_a, flux_b, on, by=None,
+                                 direction='backward',
+                                 tolerance=None,
+                                 allow_exact=True,
+                                 keep_unmatched=False):
+    """
+    for row_a, row_b in join_asof(flux_a, flux_b, 'date', by='name'):
+        row_b is the last flux_b row with row_b.date <= row_a.date and the same name
+
+    :param direction:      'backward' (row_b.on <= row_a.on), 'forward' (row_b.on >= row_a.on)
+                           or 'nearest' (smallest absolute difference, backward wins ties)
+    :param tolerance:      maximum distance between row_a.on and row_b.on (eg, a timedelta)
+    :param allow_exact:    False to require strictly less (or greater) than row_a.on
+    :param keep_unmatched: also yield (row_a, None) for rows with no match
+    """
+    if direction not in ('backward', 'forward', 'nearest'):
+        raise ValueError("invalid direction: '{}'".format(direction))
+
+    on_a, on_b = __column_pair(on)
+    i_a = column_index(flux_a, on_a)
+    i_b = column_index(flux_b, on_b)
+    key_a, key_b = __key_pair(flux_a, flux_b, by)
+
+    rows_a = row_view_cls(flux_a)
+    rows_b = row_view_cls(flux_b)
+    for r in range(1, len(rows_b)):
+        if rows_b[r].values[i_b] < rows_b[r - 1].values[i_b]:
+            raise __unsorted_error('flux_b', on_b)
+
+    strictly = not allow_exact
+    if direction == 'backward':
+        matched = __merge_asof(rows_a, rows_b, on_a, i_a, i_b, key_a, key_b, strictly, forward=False)
+    elif direction == 'forward':
+        matched = __merge_asof(rows_a, rows_b, on_a, i_a, i_b, key_a, key_b, strictly, forward=True)
+    else:
+        backward = __merge_asof(rows_a, rows_b, on_a, i_a, i_b, key_a, key_b, strictly, forward=False)
+        forward  = __merge_asof(rows_a, rows_b, on_a, i_a, i_b, key_a, key_b, strictly, forward=True)
+
+        matched = {}
+        for p in backward.keys() | forward.keys():
+            v_a = rows_a[p].values[i_a]
+            b_1 = backward.get(p)
+            b_2 = forward.get(p)
+            if b_1 is None or (b_2 is not None and (b_2.values[i_b] - v_a) < (v_a - b_1.values[i_b])):
+                matched[p] = b_2
+            else:
+                matched[p] = b_1
+
+    for p, row_a in enumerate(rows_a):
+        row_b = matched.get(p)
+
+        if row_b is not None and tolerance is not None:
+            if abs(row_b.values[i_b] - row_a.values[i_a]) > tolerance:
+                row_b = None
+
+        if row_b is not None or keep_unmatched:
+            yield row_a, row_b
+
+
+def join_interval(flux_a, flux_b, on, start, end, by=None, closed='both'):
+    """
+    for row_a, row_b in join_interval(flux_a, flux_b, 'date', 'valid_from', 'valid_to', by='name'):
+        every flux_b row whose [valid_from, valid_to] interval contains row_a.date
+
+    * flux_a sorted on on, flux_b sorted on start
+    * one sweep over both inputs, active intervals are kept in a heap per group
+      ordered by end: O((n + m) log m + number of pairs)
+
+    :param closed: 'both', 'left', 'right' or 'neither'
+    """
+    if closed not in ('both', 'left', 'right', 'neither'):
+        raise ValueError("invalid closed: '{}'".format(closed))
+
+    i_a = column_index(flux_a, on)
+    i_s = column_index(flux_b, start)
+    i_e = column_index(flux_b, end)
+    key_a, key_b = __key_pair(flux_a, flux_b, by)
+
+    include_start = closed in ('both', 'left')
+    include_end   = closed in ('both', 'right')
+
+    rows_b = iter(flux_b)
+    row_b  = next(rows_b, None)
+    active = {}                     # {group key: heap of (end, sequence, row_b)}
+    seq    = 0
+    v_prev = None
+    s_prev = None
+
+    for row_a in flux_a:
+        v_a = row_a.values[i_a]
+        if v_prev is not None and v_a < v_prev:
+            raise __unsorted_error('flux_a', on)
+        v_prev = v_a
+
+        while row_b is not None:
+            s = row_b.values[i_s]
+            if s_prev is not None and s < s_prev:
+                raise __unsorted_error('flux_b', start)
+            if (s > v_a) or (s == v_a and not include_start):
+                break
+
+            s_prev = s
+            heapq.heappush(active.setdefault(key_b(row_b.values), []), (row_b.values[i_e], seq, row_b))
+            seq  += 1
+            row_b = next(rows_b, None)
+
+        heap = active.get(key_a(row_a.values))
+        if not heap:
+            continue
+
+        # intervals that end before v_a can never match a later row_a either
+        while heap and (heap[0][0] < v_a or (heap[0][0] == v_a and not include_end)):
+            heapq.heappop(heap)
+
+        for _, _, match in sorted(heap, key=lambda item: item[1]):
+            yield row_a, match
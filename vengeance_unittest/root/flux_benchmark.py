@@ -0,0 +1,221 @@
+"""
+micro-benchmark harness, a grown-up print_performance(repeat=10)
+    * warmup runs, repeated timed runs, garbage collector disabled while timing
+    * median / p95 / mean / stdev per benchmark
+    * compare two implementations (or a saved baseline from another
+      commit) with a Mann-Whitney U significance test
+    * assert_no_regression() raises AssertionError when the candidate is
+      significantly slower than the baseline by more than a threshold
+"""
+import gc
+import json
+import math
+import time
+
+from statistics import mean
+from statistics import median
+from statistics import stdev
+
+
+class benchmark_result_cls:
+
+    def __init__(self, name, samples):
+        self.name    = name
+        self.samples = list(samples)
+
+    @property
+    def median(self):
+        return median(self.samples)
+
+    @property
+    def mean(self):
+        return mean(self.samples)
+
+    @property
+    def stdev(self):
+        if len(self.samples) < 2:
+            return 0.0
+
+        return stdev(self.samples)
+
+    @property
+    def min(self):
+        return min(self.samples)
+
+    @property
+    def p95(self):
+        s = sorted(self.samples)
+        return s[min(math.ceil(len(s) * 0.95) - 1, len(s) - 1)]
+
+    def dict(self):
+        return {'name':    self.name,
+                'samples': self.samples,
+                'median':  self.median,
+                'p95':     self.p95,
+                'mean':    self.mean,
+                'stdev':   self.stdev,
+                'min':     self.min}
+
+    def __repr__(self):
+        return '{}: median {:,.3f} ms, p95 {:,.3f} ms, stdev {:,.3f} ms ({} runs)'.format(self.name,
+                                                                                       self.median * 1000,
+                                                                                       self.p95 * 1000,
+                                                                                       self.stdev * 1000,
+                                                                                       len(self.samples))
+
+
+def benchmark(f, *args,
+              repeat=30,
+              number=1,
+              warmup=3,
+              disable_gc=True,
+              setup=None,
+              name=None,
+              **kwargs):
+    """
+    :param number: calls per timed sample, samples are reported per call
+    :param setup:  optional function called before every run (untimed),
+                   its return value replaces args, eg setup=flux.copy
+                   for functions that modify the flux in place
+    """
+    def run_args():
+        if setup is None:
+            return args
+
+        a = setup()
+        if not isinstance(a, tuple):
+            a = (a,)
+
+        return a
+
+    for _ in range(warmup):
+        f(*run_args(), **kwargs)
+
+    samples    = []
+    gc_enabled = gc.isenabled()
+    try:
+        for _ in range(repeat):
+            a = run_args()
+            gc.collect()
+            if disable_gc:
+                gc.disable()
+
+            t_1 = time.perf_counter()
+            for _ in range(number):
+                f(*a, **kwargs)
+            t_2 = time.perf_counter()
+
+            if gc_enabled:
+                gc.enable()
+
+            samples.append((t_2 - t_1) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return benchmark_result_cls(name or f.__qualname__, samples)
+
+
+def mann_whitney_u(samples_a, samples_b):
+    """ two-sided p-value, normal approximation with tie correction """
+    n_a = len(samples_a)
+    n_b = len(samples_b)
+    n   = n_a + n_b
+
+    ranked = sorted([(v, 0) for v in samples_a] +
+                    [(v, 1) for v in samples_b])
+
+    # average ranks over ties
+    ranks   = [0.0] * n
+    tie_sum = 0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+
+        t = j - i + 1
+        tie_sum += t ** 3 - t
+        i = j + 1
+
+    r_a = sum(r for r, (_, g) in zip(ranks, ranked) if g == 0)
+    u_a = r_a - n_a * (n_a + 1) / 2
+
+    mu    = n_a * n_b / 2
+    sigma = math.sqrt(n_a * n_b / 12 * ((n + 1) - tie_sum / (n * (n - 1))))
+    if sigma == 0:
+        return u_a, 1.0
+
+    z = (u_a - mu) / sigma
+
+    return u_a, math.erfc(abs(z) / math.sqrt(2))
+
+
+def compare(baseline, candidate, threshold=0.05, alpha=0.05):
+    """
+    :param threshold: relative slowdown of the median that counts as a regression (0.05 = 5%)
+    :param alpha:     significance level of the Mann-Whitney U test
+    """
+    ratio = candidate.median / baseline.median
+    _, p_value = mann_whitney_u(baseline.samples, candidate.samples)
+
+    is_significant = p_value < alpha
+
+    return {'baseline':       baseline.name,
+            'candidate':      candidate.name,
+            'ratio':          ratio,
+            'p_value':        p_value,
+            'is_significant': is_significant,
+            'is_regression':  is_significant and ratio > 1 + threshold,
+            'is_improvement': is_significant and ratio < 1 - threshold}
+
+
+def assert_no_regression(baseline, candidate, threshold=0.05, alpha=0.05):
+    c = compare(baseline, candidate, threshold, alpha)
+
+    if c['is_regression']:
+        raise AssertionError('{} is {:.1%} slower than {} (p={:.4f}, threshold {:.1%})'
+                             .format(c['candidate'],
+                                     c['ratio'] - 1,
+                                     c['baseline'],
+                                     c['p_value'],
+                                     threshold))
+
+    return c
+
+
+def print_comparison(baseline, candidate, threshold=0.05, alpha=0.05):
+    c = compare(baseline, candidate, threshold, alpha)
+
+    if c['is_regression']:
+        verdict = 'REGRESSION'
+    elif c['is_improvement']:
+        verdict = 'improvement'
+    else:
+        verdict = 'no significant change'
+
+    print()
+    print(baseline)
+    print(candidate)
+    print('{} / {}: {:.3f}x, p={:.4f}, {}'.format(c['candidate'],
+                                                 c['baseline'],
+                                                 c['ratio'],
+                                                 c['p_value'],
+                                                 verdict))
+    return c
+
+
+def save_results(results, path):
+    """ save results (eg, on one commit) to be loaded as a baseline on another """
+    with open(path, 'w') as f:
+        json.dump({r.name: r.samples for r in results}, f, indent=4)
+
+
+def load_results(path):
+    with open(path) as f:
+        d = json.load(f)
+
+    return {name: benchmark_result_cls(name, samples) for name, samples in d.items()}
@@ -0,0 +1,172 @@
+"""
+command_cache_cls
+    * on-disk cache for flux_cls.execute_commands() pipelines
+    * the flux state is stored after every command, keyed on
+      the input fingerprint + every command up to that step
+    * when only later commands change, execution resumes from
+      the last cached step instead of rerunning the whole pipeline
+    * size-bounded, least-recently-used entries are evicted first
+"""
+import hashlib
+import os
+import pickle
+
+from vengeance import flux_cls
+
+chunk_size = 10_000
+
+# attributes flux_cls.__init__() sets itself (matrix, headers...)
+base_attribute_names = frozenset(getattr(flux_cls(), '__dict__', ()))
+
+
+def fingerprint_matrix(flux):
+    """ content hash of all row values (including header row) """
+    h = hashlib.blake2b(digest_size=20)
+
+    m = flux.matrix
+    for r_1 in range(0, len(m), chunk_size):
+        chunk = [row.values for row in m[r_1:r_1 + chunk_size]]
+        h.update(pickle.dumps(chunk, pickle.HIGHEST_PROTOCOL))
+
+    return h.hexdigest()
+
+
+def fingerprint_file(path):
+    """ cheap fingerprint of a source file: path, size and modification time """
+    st = os.stat(path)
+    s  = '{}|{}|{}'.format(os.path.realpath(path), st.st_size, st.st_mtime_ns)
+
+    return hashlib.blake2b(s.encode(), digest_size=20).hexdigest()
+
+
+class command_cache_cls:
+    """
+    cache = command_cache_cls(share.files_dir + 'flux_cache', max_bytes=2 * 1024**3)
+    flux  = cache.execute_commands(flux, flux.commands)
+
+    * returns the resulting flux, which is a new object when loaded from cache
+    * entries hold the matrix values and the instance attributes set by the commands
+      (eg, flux_custom_cls.num_unique_names); a cached flux is rebuilt with
+      flux_cls.__init__(), so subclass __init__ arguments are not needed
+    * attribute values must be picklable
+    * command keys are based on repr(command), so commands should be made of
+      primitive values (str, tuple, dict...), like flux_custom_cls.commands
+    * salt: change it to invalidate entries when command method bodies change
+    """
+
+    def __init__(self, cache_dir,
+                       max_bytes=1024**3,
+                       salt=''):
+
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.salt      = salt
+
+        self.hits   = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def execute_commands(self, flux, commands, source=None):
+        """
+        :param source: optional path of the file flux was read from;
+                       when given, its fingerprint replaces hashing the matrix
+        """
+        if source is None:
+            key = fingerprint_matrix(flux)
+        else:
+            key = fingerprint_file(source)
+
+        key  = self.__chain_key(key, (type(flux).__qualname__, self.salt))
+        keys = []
+        for command in commands:
+            key = self.__chain_key(key, command)
+            keys.append(key)
+
+        # resume from last cached step
+        i_start = 0
+        for i in range(len(keys) - 1, -1, -1):
+            cached = self.__load(keys[i])
+            if cached is not None:
+                flux    = cached
+                i_start = i + 1
+                self.hits += 1
+                break
+
+        for command, key in zip(commands[i_start:], keys[i_start:]):
+            flux.execute_commands((command,))
+            self.__store(key, flux)
+            self.misses += 1
+
+        self.evict()
+
+        return flux
+
+    def evict(self):
+        """ remove least-recently-used entries until cache is within max_bytes """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.flux'):
+                continue
+
+            path = os.path.join(self.cache_dir, name)
+            st   = os.stat(path)
+            entries.append((st.st_mtime_ns, st.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+
+            os.remove(path)
+            total_bytes -= size
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.flux'):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def __chain_key(key, command):
+        s = '{}|{!r}'.format(key, command)
+        return hashlib.blake2b(s.encode(), digest_size=20).hexdigest()
+
+    def __path(self, key):
+        return os.path.join(self.cache_dir, key + '.flux')
+
+    def __load(self, key):
+        path = self.__path(key)
+
+        try:
+            with open(path, 'rb') as f:
+                cls, m, attributes = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError, TypeError, ValueError):
+            # missing, truncated, or written in an older entry format
+            return None
+
+        os.utime(path)                      # mark as recently used
+
+        flux = cls.__new__(cls)
+        flux_cls.__init__(flux, m)
+        flux.__dict__.update(attributes)
+
+        return flux
+
+    def __store(self, key, flux):
+        path   = self.__path(key)
+        path_t = path + '.tmp'
+
+        # flux_cls pickles only its constructor arguments, attributes set by commands
+        # would be lost; store the matrix values and those attributes explicitly
+        attributes = {k: v for k, v in getattr(flux, '__dict__', {}).items() if k not in base_attribute_names}
+        m          = [list(row.values) for row in flux.matrix]
+
+        with open(path_t, 'wb') as f:
+            pickle.dump((type(flux), m, attributes), f, pickle.HIGHEST_PROTOCOL)
+
+        os.replace(path_t, path)
+
+    def __repr__(self):
+        return 'command_cache_cls({}, hits: {:,}, misses: {:,})'.format(self.cache_dir,
+                                                                         self.hits,
+                                                                         self.misses)
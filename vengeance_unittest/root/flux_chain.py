@@ -0,0 +1,213 @@
+"""
+flux_chain_cls
+    * lazy concatenation of many flux_cls / row batches
+    * flux_a += batch copies the growing row list on every batch, so
+      concatenating thousands of batches is quadratic; the chain only
+      records a reference to each batch: O(total rows) overall
+    * headers are reconciled per batch on each pass (O(columns) per batch):
+      same headers are used as-is, reordered / missing columns are
+      mapped on access
+    * iteration, filtered(), map_rows() and columns() never flatten;
+      to_flux() flattens once, when a real flux_cls is needed
+    * batches are referenced, not copied: later changes to a batch (appended or
+      filtered rows, new columns) are visible in the chain, and len() / num_rows
+      count the batches on each call (O(batches)) instead of caching a total
+"""
+from vengeance import flux_cls
+from vengeance.classes.flux_row_cls import flux_row_cls
+
+from root.examples.flux_columns import column_index
+
+
+class flux_chain_cls:
+    """
+    chain = flux_chain_cls(first_batch)
+    for batch in batches:
+        chain += batch
+
+    flux = chain.to_flux()
+
+    :param strict: raise ValueError when a batch's headers differ from the chain's,
+                   otherwise, columns are matched by name and missing columns are None
+    """
+
+    def __init__(self, flux=None, header_names=None, strict=False):
+        if header_names is None and flux is None:
+            raise ValueError('flux_chain_cls requires either a flux or header_names')
+
+        if header_names is None:
+            header_names = flux.header_names()
+
+        self._header_names = list(header_names)
+        self.headers       = {h: i for i, h in enumerate(self._header_names)}
+        self.strict        = strict
+
+        self._batches = []           # (batch, r_1): a flux_cls, or a list of rows whose data starts at r_1
+
+        if flux is not None:
+            self.append(flux)
+
+    def header_names(self):
+        return list(self._header_names)
+
+    def append(self, batch):
+        """
+        :param batch: flux_cls, list of flux_row_cls, or list of primitive rows
+                      (a first row equal to the chain's header names is skipped)
+        """
+        if isinstance(batch, flux_chain_cls):
+            batch = batch.to_flux()             # a chain of chains would re-resolve every nested batch
+
+        if isinstance(batch, flux_cls):
+            self.__reorder(batch.header_names())
+            self._batches.append((batch, 1))
+            return self
+
+        r_1 = 0
+        if batch and isinstance(batch[0], flux_row_cls):
+            self.__reorder(batch[0].header_names())
+        elif batch and list(batch[0]) == self._header_names:
+            r_1 = 1
+
+        self._batches.append((batch, r_1))
+
+        return self
+
+    def __resolved(self):
+        """ (rows, r_1, reorder) for each batch, resolved on every pass so later changes to a batch are seen """
+        for batch, r_1 in self._batches:
+            if isinstance(batch, flux_cls):
+                yield batch.matrix, 1, self.__reorder(batch.header_names())
+            elif batch and isinstance(batch[0], flux_row_cls):
+                yield batch, r_1, self.__reorder(batch[0].header_names())
+            else:
+                yield batch, r_1, None
+
+    def __reorder(self, batch_names):
+        if batch_names == self._header_names:
+            return None
+
+        if self.strict:
+            raise ValueError('batch headers {} do not match {}'.format(batch_names, self._header_names))
+
+        positions = {h: i for i, h in enumerate(batch_names)}
+        return [positions.get(h) for h in self._header_names]
+
+    @staticmethod
+    def __values(row):
+        if isinstance(row, flux_row_cls):
+            return row.values
+
+        return row
+
+    def rows(self):
+        """ rows as primitive values, in chain header order """
+        values = self.__values
+        for rows, r_1, reorder in self.__resolved():
+            it = iter(rows)
+            for _ in range(r_1):
+                next(it, None)
+
+            if reorder is None:
+                for row in it:
+                    yield values(row)
+            else:
+                for row in it:
+                    v = values(row)
+                    yield [None if i is None else v[i] for i in reorder]
+
+    def __iter__(self):
+        """ flux_row_cls objects, batches with matching headers reuse their existing row objects """
+        headers = self.headers
+        for rows, r_1, reorder in self.__resolved():
+            it = iter(rows)
+            for _ in range(r_1):
+                next(it, None)
+
+            for row in it:
+                if reorder is None and isinstance(row, flux_row_cls):
+                    yield row
+                    continue
+
+                v = self.__values(row)
+                if reorder is not None:
+                    v = [None if i is None else v[i] for i in reorder]
+
+                yield flux_row_cls(headers, v)
+
+    def columns(self, *names):
+        indices = [column_index(self, n) for n in names]
+        cols    = [[] for _ in names]
+
+        for v in self.rows():
+            for col, c in zip(cols, indices):
+                col.append(v[c])
+
+        if len(cols) == 1:
+            return cols[0]
+
+        return cols
+
+    def filtered(self, f):
+        """ new flux_cls of rows where f(row) is True """
+        m = [self.header_names()]
+        m.extend(list(row.values) for row in self if f(row))
+
+        return flux_cls(m)
+
+    def map_rows(self, *columns):
+        indices = [column_index(self, c) for c in columns]
+        if len(indices) == 1:
+            c = indices[0]
+            return {row.values[c]: row for row in self}
+
+        return {tuple(row.values[c] for c in indices): row for row in self}
+
+    def map_rows_append(self, *columns):
+        indices = [column_index(self, c) for c in columns]
+
+        d = {}
+        for row in self:
+            if len(indices) == 1:
+                k = row.values[indices[0]]
+            else:
+                k = tuple(row.values[c] for c in indices)
+            d.setdefault(k, []).append(row)
+
+        return d
+
+    def to_flux(self):
+        """ flatten once into a new flux_cls, row values are copied so batches stay independent """
+        m = [self.header_names()]
+        m.extend(list(values) for values in self.rows())
+
+        return flux_cls(m)
+
+    @property
+    def num_rows(self):
+        n = 0
+        for batch, r_1 in self._batches:
+            rows = batch.matrix if isinstance(batch, flux_cls) else batch
+            n   += max(len(rows) - r_1, 0)
+
+        return n
+
+    @property
+    def num_cols(self):
+        return len(self._header_names)
+
+    @property
+    def num_batches(self):
+        return len(self._batches)
+
+    def is_empty(self):
+        return self.num_rows == 0
+
+    def __iadd__(self, batch):
+        return self.append(batch)
+
+    def __len__(self):
+        return self.num_rows
+
+    def __repr__(self):
+        return 'flux_chain_cls({:,} rows, {:,} batches)'.format(self.num_rows, len(self._batches))
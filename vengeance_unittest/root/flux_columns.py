@@ -0,0 +1,40 @@
+"""
+column helpers shared by the flux_* extension modules
+"""
+from operator import itemgetter
+
+
+def column_index(flux, column):
+    """ header name or integer index (negative indices allowed) to integer index """
+    if isinstance(column, int):
+        if column < 0:
+            column += flux.num_cols
+        return column
+
+    try:
+        return flux.headers[column]
+    except KeyError:
+        raise KeyError("column '{}' not in headers".format(column)) from None
+
+
+def column_indices(flux, columns):
+    if columns is None:
+        return []
+    if isinstance(columns, (str, int)):
+        columns = (columns,)
+
+    return [column_index(flux, c) for c in columns]
+
+
+def key_function(flux, columns):
+    """
+    function of row.values returning a hashable key, same shape as .map_rows() keys:
+        a single column:   a scalar value
+        multiple columns:  a tuple of values
+        None:              None, ie, every row in the same group
+    """
+    indices = column_indices(flux, columns)
+    if not indices:
+        return lambda values: None
+
+    return itemgetter(*indices)
@@ -0,0 +1,280 @@
+"""
+compressed file formats for flux_cls
+    * gzip, bz2 and xz from the standard library, zstd if the zstandard package is installed
+    * codec is detected from the file extension on write ('flux_file.csv.gz'),
+      and from the magic bytes on read (extension is only a fallback)
+    * files are streamed through the codec, never decompressed to a temp file
+    * writes compress in parallel:
+        gzip: independent blocks are compressed on a thread pool (zlib releases the GIL)
+              and written in order, as a multi-member gzip file any gzip reader accepts
+        zstd: zstandard's own multithreaded compressor
+    * to_csv / from_csv, to_json / from_json, serialize / deserialize, to_file / from_file
+      mirror the flux_cls methods; from_json() uses the incremental flux_json reader
+      (json arrays and ndjson)
+
+    flux_compression.to_file(flux, share.files_dir + 'flux_file.csv.gz')
+    flux = flux_compression.from_file(share.files_dir + 'flux_file.csv.gz')
+"""
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+import os
+import pickle
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from vengeance import flux_cls
+
+from root.examples import flux_json
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+magic_bytes = {'gzip': b'\x1f\x8b',
+               'zstd': b'\x28\xb5\x2f\xfd',
+               'bz2':  b'BZh',
+               'xz':   b'\xfd7zXZ\x00'}
+
+extensions = {'.gz':   'gzip',
+              '.gzip': 'gzip',
+              '.zst':  'zstd',
+              '.zstd': 'zstd',
+              '.bz2':  'bz2',
+              '.xz':   'xz'}
+
+default_block_size = 1024 * 1024
+
+
+class parallel_gzip_writer_cls(io.RawIOBase):
+    """
+    buffers writes into blocks of block_size bytes, each block is compressed
+    as a separate gzip member on a thread pool; at most 2 * threads blocks
+    are pending at any time, so memory stays bounded for any file size
+    """
+
+    def __init__(self, f, level=6, threads=None, block_size=default_block_size):
+        super().__init__()
+
+        self.f          = f
+        self.level      = level
+        self.threads    = threads or os.cpu_count() or 1
+        self.block_size = block_size
+
+        self._buffer     = bytearray()
+        self._pending    = deque()
+        self._num_blocks = 0
+        self._executor   = ThreadPoolExecutor(self.threads)
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._buffer += b
+        if len(self._buffer) >= self.block_size:
+            self.__submit()
+
+        return len(b)
+
+    def __submit(self):
+        block = bytes(self._buffer)
+        self._buffer.clear()
+        self._num_blocks += 1
+
+        self._pending.append(self._executor.submit(gzip.compress, block, self.level, mtime=0))
+        while len(self._pending) > 2 * self.threads:
+            self.f.write(self._pending.popleft().result())
+
+    def close(self):
+        if self.closed:
+            return
+
+        try:
+            if self._buffer or not self._num_blocks:
+                self.__submit()
+
+            while self._pending:
+                self.f.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown()
+            self.f.close()
+            super().close()
+
+
+def detect_codec(path):
+    """ codec name from the file's magic bytes, or its extension if the file doesn't exist yet, None if uncompressed """
+    if os.path.isfile(path):
+        with open(path, 'rb') as f:
+            head = f.read(8)
+
+        for codec, magic in magic_bytes.items():
+            if head.startswith(magic):
+                return codec
+
+        return None
+
+    return codec_from_extension(path)
+
+
+def codec_from_extension(path):
+    return extensions.get(os.path.splitext(path)[1].lower())
+
+
+def __zstandard_required():
+    if zstandard is None:
+        raise ImportError("zstd compression requires the 'zstandard' package (pip install zstandard)")
+
+
+def open_compressed(path, mode='rb', codec='infer',
+                                      encoding='utf-8',
+                                      newline=None,
+                                      level=None,
+                                      threads=None):
+    """
+    :param mode: 'rb', 'wb', 'rt' or 'wt' ('r' / 'w' are text modes)
+    :param codec: 'infer' (magic bytes on read, extension on write), None for an
+                  uncompressed file, or one of 'gzip', 'zstd', 'bz2', 'xz'
+    :param threads: compression threads on write, default is os.cpu_count()
+    """
+    is_write = 'w' in mode
+    is_text  = 'b' not in mode
+
+    if codec == 'infer':
+        codec = codec_from_extension(path) if is_write else detect_codec(path)
+
+    if codec is None:
+        f = open(path, 'wb' if is_write else 'rb')
+    elif codec == 'gzip':
+        if is_write:
+            f = parallel_gzip_writer_cls(open(path, 'wb'), 6 if level is None else level, threads)
+            f = io.BufferedWriter(f, default_block_size)
+        else:
+            f = gzip.open(path, 'rb')
+    elif codec == 'zstd':
+        __zstandard_required()
+        if is_write:
+            compressor = zstandard.ZstdCompressor(level=3 if level is None else level,
+                                                  threads=-1 if threads is None else threads)
+            f = compressor.stream_writer(open(path, 'wb'), closefd=True)
+        else:
+            decompressor = zstandard.ZstdDecompressor()
+            f = decompressor.stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+            f = io.BufferedReader(f, default_block_size)
+    elif codec == 'bz2':
+        f = bz2.open(path, 'wb' if is_write else 'rb', **({} if level is None else {'compresslevel': level}))
+    elif codec == 'xz':
+        f = lzma.open(path, 'wb' if is_write else 'rb', **({} if level is None else {'preset': level}))
+    else:
+        raise ValueError("invalid codec: '{}', must be one of {}".format(codec, tuple(magic_bytes)))
+
+    if is_text:
+        f = io.TextIOWrapper(f, encoding=encoding, newline=newline)
+
+    return f
+
+
+# region {flux_cls file formats}
+def to_csv(flux, path, encoding='utf-8', codec='infer', level=None, threads=None, **kwargs):
+    """ kwargs are passed to csv.writer """
+    with open_compressed(path, 'wt', codec, encoding, '', level, threads) as f:
+        writer = csv.writer(f, **kwargs)
+        writer.writerow(flux.header_names())
+        writer.writerows(flux.rows(1))
+
+
+def from_csv(path, encoding='utf-8', codec='infer', nrows=None, **kwargs):
+    """ kwargs are passed to csv.reader; values are read as strings, like flux_cls.from_csv() """
+    with open_compressed(path, 'rt', codec, encoding, '') as f:
+        reader = csv.reader(f, **kwargs)
+        if nrows is not None:
+            reader = islice(reader, nrows + 1)
+
+        m = list(reader)
+
+    if not m:
+        return flux_cls()
+
+    return flux_cls(m)
+
+
+def to_json(flux, path, encoding='utf-8', codec='infer', level=None, threads=None, **kwargs):
+    """ json array of objects, one row at a time; kwargs are passed to json.JSONEncoder """
+    header_names = flux.header_names()
+    dumps        = json.JSONEncoder(**kwargs).encode
+
+    with open_compressed(path, 'wt', codec, encoding, None, level, threads) as f:
+        f.write('[')
+        for i, values in enumerate(flux.rows(1)):
+            f.write(',\n' if i else '\n')
+            f.write(dumps(dict(zip(header_names, values))))
+        f.write('\n]\n')
+
+
+def to_ndjson(flux, path, encoding='utf-8', codec='infer', level=None, threads=None, **kwargs):
+    """ one json object per line """
+    header_names = flux.header_names()
+    dumps        = json.JSONEncoder(**kwargs).encode
+
+    with open_compressed(path, 'wt', codec, encoding, None, level, threads) as f:
+        for values in flux.rows(1):
+            f.write(dumps(dict(zip(header_names, values))))
+            f.write('\n')
+
+
+def from_json(path, encoding='utf-8', codec='infer', columns=None, nrows=None):
+    """ json array or ndjson, decompressed and parsed incrementally by flux_json """
+    with open_compressed(path, 'rt', codec, encoding) as f:
+        return flux_json.from_json(f, encoding, columns, nrows)
+
+
+def iter_json_chunks(path, encoding='utf-8', codec='infer', columns=None, nrows=None, chunk_rows=100_000):
+    with open_compressed(path, 'rt', codec, encoding) as f:
+        yield from flux_json.iter_json_chunks(f, encoding, columns, nrows, chunk_rows)
+
+
+def serialize(flux, path, codec='infer', level=None, threads=None):
+    with open_compressed(path, 'wb', codec, level=level, threads=threads) as f:
+        pickle.dump(flux, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def deserialize(path, codec='infer'):
+    with open_compressed(path, 'rb', codec) as f:
+        return pickle.load(f)
+
+
+file_formats = {'.csv':    (to_csv,    from_csv),
+                '.json':   (to_json,   from_json),
+                '.ndjson': (to_ndjson, from_json),
+                '.jsonl':  (to_ndjson, from_json),
+                '.flux':   (serialize, deserialize)}
+
+
+def __file_format(path):
+    """ 'flux_file.csv.gz' -> '.csv' """
+    root, ext = os.path.splitext(path)
+    if ext.lower() in extensions:
+        root, ext = os.path.splitext(root)
+
+    ext = ext.lower()
+    if ext not in file_formats:
+        raise ValueError("invalid file extension: '{}', must be one of {}, optionally followed by one of {}"
+                         .format(ext, tuple(file_formats), tuple(extensions)))
+
+    return ext
+
+
+def to_file(flux, path, **kwargs):
+    write, _ = file_formats[__file_format(path)]
+    write(flux, path, **kwargs)
+
+
+def from_file(path, **kwargs):
+    _, read = file_formats[__file_format(path)]
+    return read(path, **kwargs)
+# endregion
@@ -0,0 +1,164 @@
+"""
+snapshot diff of two flux_cls versions (eg, yesterday's and today's extract)
+    * rows are matched on key columns
+    * compared values are checked with a single tuple comparison per row, only
+      rows that differ are compared column by column for a change mask
+      (no row hashes: equal hashes, eg hash(-1) and hash(-2), would still need
+      the comparison, so hashing only added work)
+    * diff() keeps {key: row} references for the old version only
+    * diff_sorted() merges two key-sorted row streams (eg, chunked csv
+      readers) and never holds either side in memory
+"""
+from operator import itemgetter
+
+from root.examples.flux_columns import column_indices
+
+
+def change_mask(values_a, values_b):
+    return [a != b for a, b in zip(values_a, values_b)]
+
+
+class diff_result_cls:
+
+    def __init__(self, header_names):
+        self.header_names = header_names
+
+        self.added     = []         # rows only in new version
+        self.removed   = []         # rows only in old version
+        self.changed   = []         # (row_a, row_b, mask)
+        self.unchanged = 0
+
+    def changed_columns(self, mask):
+        return [h for h, is_changed in zip(self.header_names, mask) if is_changed]
+
+    def column_change_counts(self):
+        counts = [0] * len(self.header_names)
+        for _, _, mask in self.changed:
+            for c, is_changed in enumerate(mask):
+                counts[c] += is_changed
+
+        return dict(zip(self.header_names, counts))
+
+    def is_empty(self):
+        return not (self.added or self.removed or self.changed)
+
+    def __repr__(self):
+        return 'diff_result_cls(added: {:,}, removed: {:,}, changed: {:,}, unchanged: {:,})'.format(len(self.added),
+                                                                                                  len(self.removed),
+                                                                                                  len(self.changed),
+                                                                                                  self.unchanged)
+
+
+def __compared_columns(flux_a, flux_b, columns):
+    """ compared columns must exist in both versions, default: all columns in common """
+    if columns is None:
+        names_b = set(flux_b.header_names())
+        columns = [h for h in flux_a.header_names() if h in names_b]
+
+    return columns, column_indices(flux_a, columns), column_indices(flux_b, columns)
+
+
+def __getter(indices):
+    if len(indices) == 1:
+        i = indices[0]
+        return lambda values: (values[i],)
+
+    return itemgetter(*indices)
+
+
+def diff(flux_a, flux_b, key_columns, columns=None):
+    """
+    :param flux_a:      old version
+    :param flux_b:      new version
+    :param key_columns: column(s) that identify a row in both versions;
+                        duplicate keys keep the last row, same as .map_rows()
+    :param columns:     columns to compare, default: all columns in common
+
+    result.added and result.changed hold flux_b rows, result.removed holds flux_a rows
+    """
+    columns, indices_a, indices_b = __compared_columns(flux_a, flux_b, columns)
+
+    key_a = __getter(column_indices(flux_a, key_columns))
+    key_b = __getter(column_indices(flux_b, key_columns))
+    get_a = __getter(indices_a)
+    get_b = __getter(indices_b)
+
+    result = diff_result_cls(columns)
+
+    rows_a = {key_a(row.values): row for row in flux_a}
+
+    for row_b in flux_b:
+        row_a = rows_a.pop(key_b(row_b.values), None)
+        if row_a is None:
+            result.added.append(row_b)
+            continue
+
+        v_a = get_a(row_a.values)
+        v_b = get_b(row_b.values)
+        if v_a == v_b:
+            result.unchanged += 1
+            continue
+
+        result.changed.append((row_a, row_b, change_mask(v_a, v_b)))
+
+    result.removed.extend(rows_a.values())
+
+    return result
+
+
+def diff_sorted(rows_a, rows_b, header_names, key_columns, columns=None):
+    """
+    generator over two streams of primitive rows, both sorted ascending on key_columns
+    and with the same header_names (eg, flux.rows(1) or csv.reader chunks)
+
+    yields:
+        ('added',   None,     values_b, None)
+        ('removed', values_a, None,     None)
+        ('changed', values_a, values_b, mask)
+
+    memory use is constant regardless of input size
+    """
+    def indices(cols):
+        if isinstance(cols, (str, int)):
+            cols = (cols,)
+        return [header_names.index(c) if isinstance(c, str) else c for c in cols]
+
+    key = __getter(indices(key_columns))
+    if columns is None:
+        get = tuple
+    else:
+        get = __getter(indices(columns))
+
+    it_a = iter(rows_a)
+    it_b = iter(rows_b)
+    v_a  = next(it_a, None)
+    v_b  = next(it_b, None)
+
+    while v_a is not None and v_b is not None:
+        k_a = key(v_a)
+        k_b = key(v_b)
+
+        if k_a < k_b:
+            yield 'removed', v_a, None, None
+            v_a = next(it_a, None)
+        elif k_b < k_a:
+            yield 'added', None, v_b, None
+            v_b = next(it_b, None)
+        else:
+            c_a = get(v_a)
+            c_b = get(v_b)
+            if c_a != c_b:
+                mask = change_mask(c_a, c_b)
+                if any(mask):
+                    yield 'changed', v_a, v_b, mask
+
+            v_a = next(it_a, None)
+            v_b = next(it_b, None)
+
+    while v_a is not None:
+        yield 'removed', v_a, None, None
+        v_a = next(it_a, None)
+
+    while v_b is not None:
+        yield 'added', None, v_b, None
+        v_b = next(it_b, None)
@@ -6,6 +6,9 @@ flux_cls
     * when vectorization gets too complicated, and you need (or want)
       efficient row-major iteration
 """
+import asyncio
+import csv
+import multiprocessing
 import vengeance as ven
 
 from collections import namedtuple
@@ -17,6 +20,30 @@ from vengeance import is_date
 from vengeance.util.text import vengeance_message
 
 from root.examples import share
+from root.examples import flux_mmap
+from root.examples import flux_cache
+from root.examples import flux_profiling
+from root.examples import flux_instrument
+from root.examples import flux_benchmark
+from root.examples import flux_views
+from root.examples import flux_window
+from root.examples import flux_select
+from root.examples import flux_pivot
+from root.examples import flux_diff
+from root.examples import flux_asof
+from root.examples import flux_index
+from root.examples import flux_predicate
+from root.examples.flux_predicate import col
+from root.examples import flux_export
+from root.examples import flux_rows
+from root.examples import flux_chain
+from root.examples import flux_jagged
+from root.examples import flux_memory
+from root.examples import flux_pickle
+from root.examples import flux_stream
+from root.examples import flux_sqlite
+from root.examples import flux_json
+from root.examples import flux_compression
 
 profiler = share.resolve_profiler_function()
 
@@ -25,32 +52,48 @@ profiler = share.resolve_profiler_function()
 def main():
     # print(vengeance_message('vengeance {}, {}'.format(ven.__version__, ven.__release__)))
 
-    flux = instantiate_flux(num_rows=50,
-                            num_cols=10,
-                            len_values=5)
+    # low-overhead counters and timing histograms on flux_cls hot paths,
+    # enabled here or with FLUX_INSTRUMENT=1, printed by share.print_profiler()
+    # flux_cls methods are restored when the block exits
+    with flux_instrument.instrumented_flux_cls():
+        # flux_instrument.enable()
+        # flux_instrument.enable(every=10)      # only time every 10th call
 
-    iterate_flux_rows(flux)
-    iterate_primitive_rows(flux)
+        flux = instantiate_flux(num_rows=50,
+                                num_cols=10,
+                                len_values=5)
 
-    flux_aggregation_methods(flux)
-    flux_sort_and_filter_methods(flux)
+        iterate_flux_rows(flux)
+        iterate_primitive_rows(flux)
 
-    flux_row_methods(flux)
-    flux_jagged_rows(flux)
-    flux_column_methods(flux)
-    flux_column_values(flux)
+        flux_aggregation_methods(flux)
+        flux_sort_and_filter_methods(flux)
 
-    flux_join()
+        flux_row_methods(flux)
+        flux_jagged_rows(flux)
+        flux_column_methods(flux)
+        flux_column_values(flux)
+        flux_window_functions()
 
-    write_to_file(flux)
-    read_from_file()
+        flux_join()
+        flux_snapshot_diff()
 
-    # read_from_excel()
-    # write_to_excel(flux)
+        write_to_file(flux)
+        read_from_file()
+        transfer_between_processes(flux)
+        sqlite_backed_flux(flux)
 
-    flux_subclass()
+        # read_from_excel()
+        # write_to_excel(flux)
 
-    # attribute_access_performance(flux)
+        flux_subclass()
+        flux_streaming()
+
+        # attribute_access_performance(flux)
+        # benchmark_attribute_access(flux)
+        # benchmark_filter_predicates(num_rows=10_000_000)
+
+    assert not hasattr(flux_cls.sort, '__instrumented__')
 
     share.print_profiler(profiler)
 
@@ -206,6 +249,29 @@ def iterate_flux_rows(flux):
     a = [row.namedtuple() for row in flux]
     b = list(flux.namedtuples())
 
+    # bulk export: record classes cached per header set, columnar dicts, chunked batches
+    a = flux_export.to_dicts(flux)
+    a = flux_export.to_namedtuples(flux)
+    a = flux_export.to_dataclasses(flux)
+    a = flux_export.to_columns(flux)
+    a = flux_export.to_columns(flux, 'col_a', 'col_b')
+
+    for chunk in flux_export.iter_chunks(flux, 20, rowtype='dict'):
+        pass
+    for chunk in flux_export.iter_chunks(flux, 20, rowtype='columns'):
+        pass
+
+    # one record per data row, header row is not exported
+    values = [row.values for row in flux]
+    assert [list(t) for t in flux_export.to_tuples(flux)]         == values
+    assert [list(d.values()) for d in flux_export.to_dicts(flux)] == values
+    assert [list(t) for t in flux_export.to_namedtuples(flux)]    == values
+    assert sum(len(chunk) for chunk in flux_export.iter_chunks(flux, 20)) == flux.num_rows
+    assert flux_export.to_columns(flux, 'col_a')['col_a'] == [row.col_a for row in flux]
+
+    d = flux_export.to_columns(flux)
+    assert flux_export.to_columns(flux, 'col_c', 'col_a') == {'col_c': d['col_c'], 'col_a': d['col_a']}
+
     a = flux.as_array(-10)            # to help with debugging: triggers a special view in PyCharm
 
     # preferred iteration syntax
@@ -254,6 +320,34 @@ def iterate_flux_rows(flux):
         if row_1.col_a == row_2.col_b:
             pass
 
+    # zero-copy views: slices above copy the list of row references
+    for row in flux_views.row_view_cls(flux, 5, -5):
+        pass
+
+    for row in flux_views.row_view_cls(flux, 0, None, 3):
+        pass
+
+    view = flux_views.row_view_cls(flux, 5, -5)
+    a = len(view)
+    a = view[0]
+    a = view[::2]                       # slicing a view returns another view
+    a = view.to_flux()
+
+    # same rows as the copying idioms above
+    assert list(view) == flux.matrix[5:-5]
+    assert list(view[::2]) == flux.matrix[5:-5][::2]
+    assert list(flux_views.row_view_cls(view, 2, 4)) == flux.matrix[5:-5][2:4]
+    assert view.matrix == flux.matrix[:1] + flux.matrix[5:-5]
+    assert list(flux_views.pairwise(view)) == list(zip(flux.matrix[5:-5], flux.matrix[6:-5]))
+    assert list(flux_views.pairwise(flux)) == list(zip(flux.matrix[1:], flux.matrix[2:]))
+
+    for row_1, row_2 in flux_views.pairwise(flux):
+        if row_1.col_a == row_2.col_b:
+            pass
+
+    for row_1, row_2, row_3 in flux_views.window(flux, 3):
+        pass
+
 
 def iterate_primitive_rows(flux):
     """ rows as primitive values """
@@ -341,6 +435,32 @@ def flux_aggregation_methods(flux):
     sumifs   = {k: sum([row.value_a for row in rows])
                                     for k, rows in d.items()}
 
+    # pivot tables in a single hashing pass, instead of nested dicts and loops
+    flux_b = flux_pivot.pivot(flux, 'col_a', 'col_b', 'value_a', agg='sum', fill=0.0)
+    flux_b = flux_pivot.pivot(flux, ('col_a', 'col_b'), 'col_c', 'value_a', agg='mean', prefix='mean_')
+    flux_b = flux_pivot.pivot(flux, 'col_a', 'col_b', 'value_a', agg=max)
+    flux_b = flux_pivot.crosstab(flux, 'col_a', 'col_b')
+
+    # melt: the inverse of pivot
+    flux_b = flux_pivot.pivot(flux, 'col_a', 'col_b', 'value_a', agg='sum', fill=0.0)
+    flux_b = flux_pivot.melt(flux_b, 'col_a', var_name='col_b', value_name='value_a', skip_fill=True, fill=0.0)
+
+    # data rows only: pivot / melt round trip matches sumifs above
+    assert {(row.col_a, row.col_b): row.value_a for row in flux_b} == sumifs
+
+    # column keys survive the round trip with their original types
+    flux_c = flux_cls([['name', 'day', 'sold'], ['a', 1, 2], ['b', 2, 3], ['a', 2, 5]])
+    flux_b = flux_pivot.pivot(flux_c, 'name', 'day', 'sold')
+    flux_b = flux_pivot.melt(flux_b, 'name', var_name='day', value_name='sold', skip_fill=True)
+    assert sorted(flux_b.rows(1)) == sorted(flux_c.rows(1))
+
+    # keys 1 and '1' would both become header '1'
+    try:
+        flux_pivot.pivot(flux_cls([['k', 'n'], [1, 1], ['1', 1]]), 'n', 'k')
+        raise AssertionError('colliding header names should be rejected')
+    except ValueError as e:
+        pass
+
     # map dictionary values to types other than flux_row_cls
     d = flux.map_rows('col_a', 'col_b', rowtype=dict)
     d = flux.map_rows('col_a', 'col_b', rowtype=list)
@@ -375,6 +495,25 @@ def flux_aggregation_methods(flux):
     d = flux_b.map_rows_append(lambda row: id(row.values))
     flux_b.matrix[1].col_a = 'm'
 
+    # memory accounting: aliased rows are counted once, and reported as shared
+    a = flux_memory.memory_usage(flux_b)
+    a = flux_memory.memory_usage(flux, deep=False)
+    a = flux_memory.memory_usage(flux, sample=10)          # estimate from a sample of rows
+    # flux_memory.print_memory_usage(flux)
+
+    # memory budget: raises MemoryError (or calls spill) before the flux goes over budget
+    budget = flux_memory.memory_budget_cls(512 * 1024**2)
+    budget.append_rows(flux_b, [['a', 'b', 'c']] * 10)
+    # flux_b = budget.from_csv(share.files_dir + 'flux_file.csv')
+
+    # running total: estimated from the appended rows only, close to a full measurement
+    flux_c = flux_cls([['col_a', 'col_b', 'col_c']])
+    for i in range(0, 2_000, 500):
+        budget.append_rows(flux_c, [['a{}'.format(j), j, float(j)] for j in range(i, i + 500)])
+    used   = budget.used(flux_c)
+    actual = flux_memory.memory_usage(flux_c)['total']
+    assert 0.8 < used / actual < 1.25, 'budget running total {:,} vs measured {:,}'.format(used, actual)
+
 
 
     # .contiguous()
@@ -444,7 +583,107 @@ def flux_sort_and_filter_methods(flux):
     flux_b = flux_a.filtered(starts_with_criteria)
     flux_b = flux_a.filtered_by_unique('col_a', 'col_b')
 
-    pass
+    # virtual row indices: no .label_row_indices() relabel after sort / filter
+    flux_b  = flux.copy()
+    row_ids = flux_views.row_ids_cls(flux_b)
+    flux_b.sort('col_b')
+    flux_b.filter(starts_with_criteria)
+
+    for r_i, row in flux_views.enumerate_rows(flux_b):
+        original_i = row_ids.original_index(row)
+
+    for r_i, original_i, row in row_ids.labeled_rows():
+        pass
+
+    # current and original indices point back at the same row objects
+    original = flux.matrix
+    for r_i, original_i, row in row_ids.labeled_rows():
+        assert flux_b.matrix[r_i] is row
+        assert original[original_i].values == row.values
+        assert row_ids.original_row(original_i) is row
+
+    assert [r_i for r_i, _ in flux_views.enumerate_rows(flux_b)] == list(range(1, flux_b.num_rows + 1))
+
+    # declarative predicates: evaluated column-wise into a row mask,
+    # instead of a python function call (and attribute lookups) for every row
+    p_starts_with_a = (col('col_a').startswith('a') |
+                       col('col_b').startswith('a') |
+                       col('col_c').startswith('a'))
+    p_starts_with_criteria = (col('col_a')[0].isin(criteria_a) |
+                              col('col_b')[0].isin(criteria_b))
+
+    flux_b = flux_predicate.filtered(flux_a, p_starts_with_a)
+    flux_b = flux_predicate.filtered(flux_a, p_starts_with_criteria & ~col('col_c').endswith('z'))
+    flux_b = flux_predicate.filtered(flux_a, starts_with_a)           # python functions still accepted
+
+    flux_b = flux_a.copy()
+    flux_predicate.filter(flux_b, col('col_b').between('b', 'm'))
+    a = flux_predicate.mask(flux_a, p_starts_with_criteria)
+
+    # same rows as the python function, mask is aligned with data rows (no header)
+    flux_b = flux_predicate.filtered(flux_a, p_starts_with_a)
+    assert [row.values for row in flux_b] == [row.values for row in flux_a if starts_with_a(row)]
+
+    flux_c = flux_cls([['name', 'n'], ['a', 1], ['b', 2], ['a', 3]])
+    assert [row.n for row in flux_predicate.filtered(flux_c, col('name') == 'a')] == [1, 3]
+    assert flux_predicate.mask(flux_c, col('n') >= 2) == [False, True, True]
+
+    # & / | short-circuit like and / or: None.startswith() is never called
+    flux_c = flux_cls([['x'], ['ab'], [None], ['ba'], [None]])
+    p_a    = ~col('x').is_none() & col('x').startswith('a')
+    p_b    = col('x').is_none() | col('x')[0].isin('b')
+    assert flux_predicate.mask(flux_c, p_a) == [p_a(row) for row in flux_c] == [True, False, False, False]
+    assert flux_predicate.mask(flux_c, p_b) == [p_b(row) for row in flux_c] == [False, True, True, True]
+
+    # top-k selection with bounded heaps instead of .sorted() followed by .matrix[:k]
+    flux_b = flux_select.top_k(flux_a, 10, 'col_a', 'col_b', 'col_c', reverse=[True, False, True])
+    flux_b = flux_select.nlargest(flux_a, 10, 'col_b')
+    flux_b = flux_select.nsmallest(flux_a, 10, 'col_a', 'col_b')
+    row    = flux_select.nth_value(flux_a, 5, 'col_b')
+    d      = flux_select.top_k_by_group(flux_a, 3, 'col_a', 'col_b', reverse=True)
+
+    # same rows as a full sort, including a scalar reverse over several columns
+    for reverse in (True, [True, False, True]):
+        flux_b = flux_select.top_k(flux_a, 10, 'col_a', 'col_b', 'col_c', reverse=reverse)
+        flux_c = flux_a.sorted('col_a', 'col_b', 'col_c', reverse=reverse)
+        assert list(flux_b.rows(1)) == list(flux_c.rows(1, 11))
+
+    flux_c = flux_cls([['a', 'b'], [1, 1], [1, 2], [2, 1], [2, 2]])
+    flux_b = flux_select.top_k(flux_c, 3, 'a', 'b', reverse=True)
+    assert list(flux_b.rows(1)) == list(flux_c.sorted('a', 'b', reverse=True).rows(1, 4)) == [[2, 1], [2, 2], [1, 1]]
+
+    # sorted index: logarithmic range lookups instead of a python predicate call per row
+    index = flux_index.sorted_index_cls(flux_a, 'col_a')
+    rows  = index.prefix('a')                       # same rows as filter(lambda r: r.col_a.startswith('a'))
+    rows  = index.between('c', 'f')                 # 'c' <= col_a < 'f'
+    rows  = index.between('c', 'f', inclusive=(True, True))
+    rows  = index.ge('m')
+    rows  = index.eq(flux_a.matrix[1].col_a)
+    flux_b = rows.to_flux()
+
+    index.append_rows([['new' for _ in range(flux_a.num_cols)]])     # maintained incrementally
+
+    index = flux_index.sorted_index_cls(flux_a, 'col_a', 'col_b')
+    rows  = index.between(('a', 'a'), ('c', 'c'))
+
+    # same rows as the python predicate, in key order
+    index = flux_index.sorted_index_cls(flux_a, 'col_a')
+    rows  = index.between('c', 'f')
+    assert list(rows) == sorted((row for row in flux_a if 'c' <= row.col_a < 'f'), key=lambda row: row.col_a)
+    assert rows.header_names() == flux_a.header_names()
+
+    # views are invalidated by changes to the index, not silently shifted
+    index.append_rows([['d' for _ in range(flux_a.num_cols)]])
+    try:
+        list(rows)
+        raise AssertionError('stale index view should be rejected')
+    except RuntimeError as e:
+        pass
+
+    assert index.eq('d')[-1] is flux_a.matrix[-1]
+
+    index = flux_index.sorted_index_cls(flux_cls([['col_a']]), 'col_a')
+    assert index.ge('a').header_names() == ['col_a']
 
 
 def flux_row_methods(flux):
@@ -485,6 +724,55 @@ def flux_row_methods(flux):
     flux_a += flux_b.matrix[10:15]
     flux_a += [['a', 'b', 'c']] * 10
 
+    # lazy concatenation: each += records a reference to the batch instead of
+    # re-copying the growing row list, headers are checked once per batch
+    chain = flux_chain.flux_chain_cls(flux.copy())
+    chain += flux_b
+    chain += flux_b.matrix[-5:]
+    chain += [flux.header_names()] + [['a'] * flux.num_cols] * 10
+
+    for row in chain:
+        pass
+
+    a = chain.columns('col_a')
+    a = chain.map_rows_append('col_a')
+    a = chain.filtered(lambda row: row.col_a.startswith('a'))
+    flux_c = chain.to_flux()                # flattens once
+
+    # same rows as the eager concatenation, batches stay live references
+    assert [row.values for row in chain] == [row.values for row in flux] + \
+                                            [row.values for row in flux_b] + \
+                                            [row.values for row in flux_b.matrix[-5:]] + \
+                                            [['a'] * flux.num_cols] * 10
+
+    flux_c = flux.copy()
+    chain  = flux_chain.flux_chain_cls(flux_c)
+    flux_c.filter(lambda row: row.col_a.startswith('a'))
+    flux_c.append_rows([['new'] * flux.num_cols])
+    assert len(chain) == sum(1 for _ in chain) == flux_c.num_rows
+
+    # chunked row store: inserts / deletes in the middle only shift one block of rows
+    flux_a = flux_rows.use_chunked_rows(flux.copy(), block_size=1_000)
+    flux_a.matrix.insert(5, flux_a.matrix[1])
+    flux_a.matrix.insert_rows(5, flux_b.matrix[1:4])
+    del flux_a.matrix[11:20]
+
+    row = flux_a.matrix[10]
+    for row in flux_a.matrix:
+        pass
+
+    # same rows as the same edits on a python list
+    m = flux.copy().matrix
+    m.insert(5, m[1])
+    m[5:5] = flux_b.matrix[1:4]
+    del m[11:20]
+    assert [row.values for row in flux_a.matrix] == [row.values for row in m]
+
+    flux_a.insert_rows(5, [['new' for _ in range(flux_a.num_cols)]])
+    assert flux_a.matrix[5].values == ['new' for _ in range(flux_a.num_cols)]
+
+    flux_a = flux_rows.use_list_rows(flux_a)
+
     pass
 
 
@@ -519,6 +807,34 @@ def flux_jagged_rows(flux):
     as_array_b = flux.as_array()
     assert repr(as_array_a) != repr(as_array_b)
 
+    # incremental width tracking: rows are measured once, when they change through the tracker
+    tracker = flux_jagged.width_tracker_cls(flux)
+    assert tracker.is_jagged()
+
+    tracker.append_rows([['#err'] * 2,
+                         ['#err'] * flux.num_cols])
+    tracker.extend_values(flux.matrix[i + 1], ['#err'])
+    tracker.set_values(flux.matrix[i + 3], ['#err'])
+
+    a = tracker.is_jagged()                 # O(1)
+    a = list(tracker.jagged_rows())         # only walks known offenders
+    a = tracker.stats()
+
+    tracker.repair(fill=None)               # pad / truncate offenders to header width
+    assert not tracker.is_jagged()
+    assert not flux.is_jagged()
+
+    # header width changes are picked up before repairing
+    flux.matrix[i].values = ['#err']
+    tracker = flux_jagged.width_tracker_cls(flux)
+    flux.append_columns('col_new')
+    tracker.repair()
+    assert not tracker.is_jagged()
+    assert not flux.is_jagged()
+
+    # full scan, without a tracker
+    flux_jagged.repair_all(flux)
+
     pass
 
 
@@ -626,6 +942,50 @@ def flux_column_values(flux):
     pass
 
 
+def flux_window_functions():
+    """
+    instead of row-offset loops like
+        for row_1, row_2 in zip(flux.matrix[1:], flux.matrix[2:]):
+
+    new columns are appended (or existing columns overwritten) in place
+    """
+    flux = flux_cls([['name', 'date', 'apples_sold'],
+                     ['alice', '2019-01-01', 2],
+                     ['bob',   '2019-01-01', 5],
+                     ['alice', '2019-01-02', 4],
+                     ['bob',   '2019-01-02', 3],
+                     ['alice', '2019-01-03', 1],
+                     ['bob',   '2019-01-03', 7]])
+
+    flux_window.lag(flux, 'apples_sold')
+    flux_window.lead(flux, 'apples_sold', fill=0)
+    flux_window.shift(flux, 'apples_sold', -1, name='next_sold', partition_by='name')
+    flux_window.diff(flux, 'apples_sold', fill=0, partition_by='name')
+
+    flux_window.rolling(flux, 'apples_sold', 2, 'sum',  partition_by='name')
+    flux_window.rolling(flux, 'apples_sold', 2, 'mean', partition_by='name', min_periods=1)
+    flux_window.rolling(flux, 'apples_sold', 3, 'max')
+
+    flux_window.cumulative(flux, 'apples_sold', 'sum',   partition_by='name')
+    flux_window.cumulative(flux, 'apples_sold', 'count', partition_by='name')
+
+    flux_window.rank(flux, 'apples_sold', reverse=True, partition_by='date')
+    flux_window.rank(flux, 'apples_sold', name='dense_rank', method='dense')
+
+    # header row is never part of a window
+    assert [row.name for row in flux]                == ['alice', 'bob', 'alice', 'bob', 'alice', 'bob']
+    assert [row.apples_sold_lag_1 for row in flux]   == [None, 2, 5, 4, 3, 1]
+    assert [row.next_sold for row in flux]           == [4, 3, 1, 7, None, None]
+    assert [row.apples_sold_cum_sum for row in flux] == [2, 5, 6, 8, 7, 15]
+    assert [row.apples_sold_rank for row in flux]    == [2, 1, 1, 2, 2, 1]
+
+    try:
+        flux_window.diff(flux, 'apples_sold', n=0)
+        raise AssertionError('diff(n=0) should be rejected')
+    except ValueError as e:
+        pass
+
+
 def flux_join():
 
     flux_a = flux_cls([['other_name', 'col_b', 'col_c'],
@@ -662,12 +1022,92 @@ def flux_join():
         row_a.cost   = row_b.cost
         row_a.weight = row_b.weight
 
+    # as-of join: latest price with price_date <= trade date, per name
+    #   both flux must already be sorted on their date columns
+    flux_trades = flux_cls([['name', 'date',       'qty'],
+                            ['a',    '2019-01-02', 10],
+                            ['e',    '2019-01-03', 20],
+                            ['a',    '2019-01-05', 30]])
+    flux_prices = flux_cls([['name', 'price_date', 'price', 'valid_to'],
+                            ['a',    '2019-01-01', 1.10,    '2019-01-03'],
+                            ['e',    '2019-01-02', 2.20,    '2019-01-09'],
+                            ['a',    '2019-01-04', 1.15,    '2019-01-09']])
+
+    flux_trades.append_columns('price')
+    for row_a, row_b in flux_asof.join_asof(flux_trades, flux_prices, {'date': 'price_date'}, by='name'):
+        row_a.price = row_b.price
+
+    a = list(flux_asof.join_asof(flux_trades, flux_prices, {'date': 'price_date'}, by='name', direction='forward'))
+    a = list(flux_asof.join_asof(flux_trades, flux_prices, {'date': 'price_date'}, by='name', keep_unmatched=True))
+
+    # interval join: every price row whose [price_date, valid_to] contains the trade date
+    a = list(flux_asof.join_interval(flux_trades, flux_prices, 'date', 'price_date', 'valid_to', by='name'))
+
+
+def flux_snapshot_diff():
+    """ compare two versions of an extract on key columns """
+    flux_a = flux_cls([['id', 'name', 'cost'],
+                       ['#6151-165', 'a', 50.10],
+                       ['#8979-154', 'e', 100.50],
+                       ['#6654-810', 'g', 130.00]])
+    flux_b = flux_cls([['id', 'name', 'cost'],
+                       ['#6151-165', 'a', 50.10],
+                       ['#8979-154', 'e', 101.00],
+                       ['#1234-567', 'h', 12.00]])
+
+    result = flux_diff.diff(flux_a, flux_b, 'id')
+
+    a = result.added                        # rows from flux_b
+    a = result.removed                      # rows from flux_a
+    for row_a, row_b, mask in result.changed:
+        a = result.changed_columns(mask)
+
+    a = result.column_change_counts()
+
+    assert [row.id for row in result.added]               == ['#1234-567']
+    assert [row.id for row in result.removed]             == ['#6654-810']
+    assert [row_b.cost for _, row_b, _ in result.changed] == [101.00]
+
+    # extracts too large to hold twice in memory: merge two streams sorted by key
+    flux_a.sort('id')
+    flux_b.sort('id')
+    statuses = []
+    for status, values_a, values_b, mask in flux_diff.diff_sorted(flux_a.rows(1),
+                                                                  flux_b.rows(1),
+                                                                  flux_a.header_names(),
+                                                                  'id'):
+        statuses.append(status)
+
+    assert sorted(statuses) == ['added', 'changed', 'removed']
+
+    # values are compared directly: equal hash() values, unhashable cells
+    flux_c = flux_cls([['id', 'cost'], ['#1', -1]])
+    flux_d = flux_cls([['id', 'cost'], ['#1', -2]])
+    assert len(flux_diff.diff(flux_c, flux_d, 'id').changed) == 1
+
+    flux_c = flux_cls([['id', 'tags'], ['#1', [1, 2]], ['#2', [3]]])
+    flux_d = flux_cls([['id', 'tags'], ['#1', [1, 2]], ['#2', [4]]])
+    result = flux_diff.diff(flux_c, flux_d, 'id')
+    assert (result.unchanged, [row_b.id for _, row_b, _ in result.changed]) == (1, ['#2'])
+
 
 def write_to_file(flux):
     flux.to_csv(share.files_dir + 'flux_file.csv')
     flux.to_json(share.files_dir + 'flux_file.json')
     flux.serialize(share.files_dir + 'flux_file.flux')
 
+    # compressed: codec from the extension, blocks are compressed on multiple threads
+    flux_compression.to_file(flux, share.files_dir + 'flux_file.csv.gz')
+    flux_compression.to_file(flux, share.files_dir + 'flux_file.json.gz')
+    flux_compression.to_file(flux, share.files_dir + 'flux_file.flux.gz')
+    # flux_compression.to_csv(flux, share.files_dir + 'flux_file.csv.zst', level=10)      # requires zstandard
+
+    # one json object per line, for flux_json
+    flux_json.to_ndjson(flux, share.files_dir + 'flux_file.ndjson')
+
+    # memory-mapped file format, for mmap_flux_cls
+    flux_mmap.to_mmap_file(flux, share.files_dir + 'flux_file.fluxm')
+
     # .to_json() with no path argument returns a json string
     # json_str = flux.to_json()
 
@@ -690,6 +1130,54 @@ def read_from_file():
     flux = flux_cls.from_json(share.files_dir + 'flux_file.json')
     flux = flux_cls.deserialize(share.files_dir + 'flux_file.flux')
 
+    # read-only, memory-mapped: rows are decoded on access, file is never fully loaded
+    with flux_mmap.mmap_flux_cls(share.files_dir + 'flux_file.fluxm') as flux_m:
+        a = flux_m.matrix[0]
+        a = flux_m.matrix[-1]
+        a = flux_m['col_a']
+
+        for row in flux_m:
+            a = row.col_a
+
+        flux = flux_m.to_flux(1, 20)           # mutable copy of a range of rows
+
+    # same rows as the flux the file was written from
+    flux = flux_cls.deserialize(share.files_dir + 'flux_file.flux')
+    with flux_mmap.mmap_flux_cls(share.files_dir + 'flux_file.fluxm') as flux_m:
+        assert list(flux_m.rows()) == list(flux.rows())
+        assert list(flux_m.to_flux().rows()) == list(flux.rows())
+        assert flux_m['col_a'] == list(flux['col_a'])
+
+    # column projection
+    with flux_mmap.mmap_flux_cls(share.files_dir + 'flux_file.fluxm', columns=['col_a', 'col_b']) as flux_m:
+        a = flux_m.header_names()
+
+    # compressed: codec from the magic bytes, decompressed while reading
+    flux = flux_compression.from_file(share.files_dir + 'flux_file.csv.gz')
+    flux = flux_compression.from_file(share.files_dir + 'flux_file.flux.gz')
+    flux = flux_compression.from_json(share.files_dir + 'flux_file.json.gz', columns=['col_a'], nrows=50)
+
+    # compressed round trips: same rows as the uncompressed files written from the same flux
+    flux   = flux_cls.from_csv(share.files_dir + 'flux_file.csv')
+    flux_b = flux_compression.from_file(share.files_dir + 'flux_file.csv.gz')
+    assert [row.values for row in flux_b] == [row.values for row in flux]
+
+    flux   = flux_cls.from_json(share.files_dir + 'flux_file.json')
+    flux_b = flux_compression.from_file(share.files_dir + 'flux_file.json.gz')
+    assert [row.values for row in flux_b] == [row.values for row in flux]
+
+    # incremental json / ndjson: rows are built as the file is read
+    flux = flux_json.from_json(share.files_dir + 'flux_file.json')
+    flux = flux_json.from_json(share.files_dir + 'flux_file.json', columns=['col_a', 'col_b'], nrows=50)
+    for flux_b in flux_json.iter_json_chunks(share.files_dir + 'flux_file.json', chunk_rows=10):
+        a = flux_b.num_rows
+
+    # ndjson round trip: same rows as the json file written from the same flux
+    flux   = flux_cls.from_json(share.files_dir + 'flux_file.json')
+    flux_b = flux_json.from_json(share.files_dir + 'flux_file.ndjson')
+    assert flux_b.header_names() == flux.header_names()
+    assert [row.values for row in flux_b] == [row.values for row in flux]
+
     # .from_file()
     # flux = flux_cls.from_file(share.files_dir + 'flux_file.csv')
     # flux = flux_cls.from_file(share.files_dir + 'flux_file.json')
@@ -707,6 +1195,101 @@ def read_from_file():
     pass
 
 
+def transfer_between_processes(flux):
+    """
+    int and float columns are sent as out-of-band pickle buffers,
+    header names are sent once instead of with every row
+    """
+    data, buffers = flux_pickle.dumps(flux)
+    flux_b = flux_pickle.loads(data, buffers)
+    assert [row.values for row in flux_b.matrix] == [row.values for row in flux.matrix]
+
+    flux_c = flux_cls([['id', 'amount'], [1, 10.5], [2, 20.25], [3, 30.0]])
+    data, buffers = flux_pickle.dumps(flux_c)
+    assert len(buffers) == 2                                    # id and amount columns, out-of-band
+    assert [row.values for row in flux_pickle.loads(data, buffers).matrix] == [row.values for row in flux_c.matrix]
+
+    # fan-out: copy flux into shared memory once, workers attach by name
+    # the segment stays alive until shared.release() (end of the with block)
+    with flux_pickle.share_flux(flux) as shared:
+        queue  = multiprocessing.Queue()
+        worker = multiprocessing.Process(target=_attach_shared_flux, args=(shared.handle, queue))
+        worker.start()
+        values = queue.get(timeout=60)
+        worker.join()
+
+        assert worker.exitcode == 0
+        assert values == [row.values for row in flux.matrix]
+
+        # attached again after the worker process exited: the segment is still there
+        flux_b = flux_pickle.attach_flux(shared.handle)
+        assert [row.values for row in flux_b.matrix] == [row.values for row in flux.matrix]
+        # with multiprocessing.Pool() as pool:
+        #     pool.map(worker_function, [shared.handle] * 16)
+
+    pass
+
+
+def _attach_shared_flux(handle, queue):
+    """ runs in a worker process """
+    flux = flux_pickle.attach_flux(handle)
+    queue.put([row.values for row in flux.matrix])
+
+
+def sqlite_backed_flux(flux):
+    """
+    for datasets larger than memory: filter, sort, unique, group_by and
+    map_rows run as sql queries, rows are only read when iterated
+    """
+    pool = flux_sqlite.connection_pool_cls(':memory:')
+    # pool = flux_sqlite.connection_pool_cls(share.files_dir + 'flux.db')
+
+    flux_s = flux_sqlite.to_sqlite(flux, pool, 'flux', if_exists='replace')
+    # flux_s = flux_sqlite.from_sqlite(pool, 'flux')
+
+    # same indexing as flux.rows(): r_1=0 (default) includes the header row
+    assert list(flux_s.rows()) == list(flux.rows())
+    assert list(flux_s.rows(1)) == [row.values for row in flux]
+    assert list(flux_s.rows(1, 3)) == list(flux.rows(1, 3))
+
+    p_starts_with_a = col('col_a').startswith('a') | col('col_b').startswith('a')
+    flux_s.filter(p_starts_with_a)
+    assert flux_s.num_rows == flux_predicate.filtered(flux, p_starts_with_a).num_rows
+
+    flux_s.filter('length(col_c) > ?', (2,))
+    flux_s.sort('col_a', 'col_b', reverse=[False, True])
+
+    for row in flux_s:
+        a = row.col_a
+
+    a = flux_s.num_rows
+    a = flux_s.unique('col_a')
+    a = flux_s.group_by('col_a', n=('count', 'col_b'), col_b_max=('max', 'col_b'))
+
+    # lookups are indexed queries, the table is never loaded into a dict
+    d = flux_s.map_rows('col_b')
+    a = d.get('value')
+    flux_b = flux_s.to_flux()
+    assert {k: row.values for k, row in flux_b.map_rows('col_b').items()} == \
+           {k: d[k].values for k in d}
+
+    # map_rows() inside a loop over a view: the cursor stays open (more rows than one fetch),
+    # so the index is deferred instead of raising 'database table is locked'
+    flux_c   = flux_cls([['id', 'name']] + [[i, 'name_{}'.format(i % 100)] for i in range(25_000)])
+    flux_s_c = flux_sqlite.to_sqlite(flux_c, pool, 'flux_c', if_exists='replace')
+    for row in flux_s_c:
+        d = flux_s_c.map_rows('name')
+        assert d['name_7'].id == 24_907
+        break
+    assert d['name_7'].id == 24_907
+
+    flux_b = flux_s.filtered(lambda _row_: _row_.col_c.endswith('z'))      # python function, in-memory result
+
+    pool.close()
+
+    pass
+
+
 def read_from_excel():
     if ven.loads_excel_module is False:
         print('excel module excluded for platform compatibility')
@@ -765,6 +1348,17 @@ def flux_subclass():
     # flux.execute_commands(flux.commands, profiler='line_profiler')
     # flux.execute_commands(flux.commands, profiler='print_runtime')
 
+    # per-command wall / cpu time, rows in / out and memory, aggregated across runs
+    # command_profiler = flux_profiling.command_profiler_cls()
+    # for _ in range(10):
+    #     command_profiler.execute_commands(flux_custom_cls(m, 'apples'), flux.commands)
+    # command_profiler.print_report()
+    # command_profiler.to_json(share.files_dir + 'flux_profile.json')
+
+    # on-disk cache: resumes from the last cached command when only later commands change
+    # cache = flux_cache.command_cache_cls(share.files_dir + 'flux_cache', max_bytes=2 * 1024**3)
+    # flux  = cache.execute_commands(flux_custom_cls(m, 'apples'), flux.commands)
+
     flux_b = flux.copy()
     flux.append_columns('bleh')
     flux_b.append_columns('bleh_b')
@@ -772,6 +1366,56 @@ def flux_subclass():
     pass
 
 
+def flux_streaming():
+    """
+    flux_custom_cls.commands applied to each batch of a continuously arriving feed;
+    reading, transforming and writing batches overlap, bounded queues between
+    them hold back the source when the commands or the sink fall behind
+    """
+    m = [['transaction_id', 'name', 'apples_sold', 'apples_bought', 'date'],
+         ['id-001', 'alice', 2, 0, '2019-01-13'],
+         ['id-002', 'alice', 0, 1, '2018-03-01'],
+         ['id-003', 'bob',   2, 5, '2019-07-22'],
+         ['id-004', 'chris', 2, 1, '2019-06-28'],
+         ['id-005',  None,   7, 1,  None]]
+    flux_cls(m).to_csv(share.files_dir + 'transactions.csv')
+
+    pipeline = flux_stream.stream_pipeline_cls(flux_custom_cls.commands,
+                                               flux_factory=lambda m: flux_custom_cls(m, 'apples'),
+                                               maxsize=4)
+
+    # csv values are all strings: convert them in the source, before the commands compare apples_sold >= 2
+    # follow=True (default) keeps waiting for rows appended to the file
+    source = flux_stream.tail_file(share.files_dir + 'transactions.csv',
+                                   batch_size=10_000,
+                                   follow=False,
+                                   parse=_parse_transaction_line)
+    # source = flux_stream.read_socket('127.0.0.1', 8_000)
+    # source = flux_stream.read_queue(asyncio_queue)
+
+    sink   = flux_stream.csv_sink_cls(share.files_dir + 'transactions_out.csv')
+    chain  = flux_stream.chain_sink_cls()
+    stats  = asyncio.run(pipeline.run(source, sink, chain))
+
+    # a single batch: same result as running the commands on the whole matrix
+    flux = flux_custom_cls(m, 'apples')
+    flux.execute_commands(flux.commands)
+    assert list(chain.to_flux().rows()) == list(flux.rows())
+    assert stats['rows_in'] == len(m) - 1
+
+    # one header row, then the data rows of every batch
+    flux_b = flux_cls.from_csv(share.files_dir + 'transactions_out.csv')
+    assert flux_b.num_rows == stats['rows_out'] == flux.num_rows
+
+    pass
+
+
+def _parse_transaction_line(line):
+    """ csv line -> row: digits to int, empty strings to None """
+    row = next(csv.reader([line]))
+    return [int(v) if v.isdigit() else (v or None) for v in row]
+
+
 class flux_custom_cls(flux_cls):
 
     # high-level summary of state transformations
@@ -855,6 +1499,50 @@ def attribute_access_performance(flux):
         # row.values = [None] * len(row)
 
 
+def values_access_performance(flux):
+    for row in flux:
+        values = row.values
+        values[0] = values[0]
+        values[1] = values[1]
+        values[2] = values[2]
+
+
+def benchmark_filter_predicates(num_rows=10_000_000):
+    """ closure filter functions vs flux_predicate column-wise evaluation """
+    flux = flux_cls(share.random_matrix(num_rows, num_cols=3, len_values=3))
+
+    criteria_a = {'c', 'd', 'e', 'f', 'z'}
+    criteria_b = {'a', 'b', 'm'}
+
+    def starts_with_criteria(_row_):
+        return (_row_.col_a[0] in criteria_a or
+                _row_.col_b[0] in criteria_b)
+
+    p_starts_with_criteria = (col('col_a')[0].isin(criteria_a) |
+                              col('col_b')[0].isin(criteria_b))
+
+    a = flux_benchmark.benchmark(flux_predicate.mask, flux, starts_with_criteria,   repeat=5, warmup=1, name='closure')
+    b = flux_benchmark.benchmark(flux_predicate.mask, flux, p_starts_with_criteria, repeat=5, warmup=1, name='predicate')
+
+    flux_benchmark.print_comparison(a, b)
+
+
+def benchmark_attribute_access(flux):
+    """
+    compare two implementations, or save results on one commit with
+        flux_benchmark.save_results()
+    and load them as the baseline on another with
+        flux_benchmark.load_results()
+    """
+    a = flux_benchmark.benchmark(attribute_access_performance, setup=flux.copy, repeat=30, warmup=3)
+    b = flux_benchmark.benchmark(values_access_performance,    setup=flux.copy, repeat=30, warmup=3)
+
+    flux_benchmark.print_comparison(a, b)
+
+    # raises AssertionError if b is significantly more than 5% slower than a
+    flux_benchmark.assert_no_regression(a, b, threshold=0.05)
+
+
 if __name__ == '__main__':
     main()
 
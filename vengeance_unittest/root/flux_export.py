@@ -0,0 +1,132 @@
+"""
+bulk record export
+    * namedtuple / dataclass classes are created once per set of header
+      names and cached, rather than per row or per call
+    * to_columns(): struct-of-arrays {header: [values]}, transposed with zip()
+    * iter_chunks(): the same conversions in fixed-size batches, for handing
+      millions of rows to json apis, orms or multiprocessing queues
+"""
+import keyword
+
+from collections import namedtuple
+from dataclasses import make_dataclass
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
+
+from root.examples.flux_columns import column_indices
+
+
+def __field_names(header_names):
+    """ valid, unique python identifiers, positional names for anything else (same as namedtuple rename=True) """
+    names = []
+    seen  = set()
+    for i, h in enumerate(header_names):
+        h = str(h)
+        if not h.isidentifier() or keyword.iskeyword(h) or h.startswith('_') or h in seen:
+            h = '_{}'.format(i)
+
+        names.append(h)
+        seen.add(h)
+
+    return names
+
+
+@lru_cache(maxsize=256)
+def namedtuple_cls(header_names, typename='flux_namedtuple'):
+    """ :param header_names: tuple of header names (hashable, for the cache) """
+    return namedtuple(typename, __field_names(header_names), rename=True)
+
+
+@lru_cache(maxsize=256)
+def dataclass_cls(header_names, typename='flux_dataclass'):
+    """ :param header_names: tuple of header names (hashable, for the cache) """
+    try:
+        return make_dataclass(typename, __field_names(header_names), slots=True)
+    except TypeError:
+        # slots argument requires python 3.10
+        return make_dataclass(typename, __field_names(header_names))
+
+
+def to_tuples(flux):
+    return list(map(tuple, flux.rows(1)))
+
+
+def to_dicts(flux):
+    names = tuple(flux.header_names())
+    return [dict(zip(names, values)) for values in flux.rows(1)]
+
+
+def to_namedtuples(flux):
+    cls = namedtuple_cls(tuple(flux.header_names()))
+    return list(map(cls._make, flux.rows(1)))
+
+
+def to_dataclasses(flux):
+    cls = dataclass_cls(tuple(flux.header_names()))
+    return [cls(*values) for values in flux.rows(1)]
+
+
+def to_columns(flux, *columns):
+    """
+    {header name: [column values]}
+
+    * columns: only these columns are transposed, default is every column
+    * jagged rows are truncated to the shortest row, see flux.is_jagged()
+    """
+    names = flux.header_names()
+    if columns:
+        indices = column_indices(flux, columns)
+        names   = [names[i] for i in indices]
+
+    if flux.is_empty():
+        return {h: [] for h in names}
+
+    if not columns:
+        return dict(zip(names, map(list, zip(*flux.rows(1)))))
+
+    if len(indices) == 1:
+        i = indices[0]
+        return {names[0]: [values[i] for values in flux.rows(1)]}
+
+    getter = itemgetter(*indices)
+    return dict(zip(names, map(list, zip(*map(getter, flux.rows(1))))))
+
+
+rowtypes = ('list', 'tuple', 'dict', 'namedtuple', 'dataclass', 'columns')
+
+
+def iter_chunks(flux, chunk_size=100_000, rowtype='list'):
+    """
+    for chunk in iter_chunks(flux, 50_000, rowtype='dict'):
+        requests.post(url, json=chunk)
+
+    :param rowtype: 'list', 'tuple', 'dict', 'namedtuple', 'dataclass' or 'columns'
+    """
+    if rowtype not in rowtypes:
+        raise ValueError("invalid rowtype: '{}', must be one of {}".format(rowtype, rowtypes))
+
+    names = tuple(flux.header_names())
+    rows  = flux.rows(1)
+
+    if rowtype == 'namedtuple':
+        cls = namedtuple_cls(names)
+        convert = lambda chunk: list(map(cls._make, chunk))
+    elif rowtype == 'dataclass':
+        cls = dataclass_cls(names)
+        convert = lambda chunk: [cls(*values) for values in chunk]
+    elif rowtype == 'dict':
+        convert = lambda chunk: [dict(zip(names, values)) for values in chunk]
+    elif rowtype == 'tuple':
+        convert = lambda chunk: list(map(tuple, chunk))
+    elif rowtype == 'columns':
+        convert = lambda chunk: dict(zip(names, map(list, zip(*chunk))))
+    else:
+        convert = list
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        yield convert(chunk)
@@ -0,0 +1,173 @@
+"""
+sorted_index_cls
+    * sorted secondary index on one or more flux_cls columns
+    * range lookups: between, >=, >, <=, <, ==, string prefix
+      in O(log n), instead of flux.filter(lambda r: lo <= r.amount < hi)
+      calling a python predicate on every row
+    * lookups return row_view_cls views over the index, no rows are copied;
+      add() / append_rows() / rebuild() update the index in place and invalidate
+      views returned before them: using a stale view raises RuntimeError,
+      repeat the lookup instead (like iterating a dict that changed size)
+    * append_rows() adds rows to both the flux and the index
+"""
+from bisect import bisect_left
+from bisect import bisect_right
+from heapq import merge
+from operator import itemgetter
+
+from root.examples.flux_columns import column_indices
+from root.examples.flux_views import row_view_cls
+
+insort_threshold = 64
+
+
+class sorted_index_cls:
+    """
+    index = sorted_index_cls(flux, 'amount')
+    for row in index.between(100, 200):
+        ...
+
+    * key values must be comparable with each other (eg, no None mixed with numbers)
+    * multi-column indexes take tuples as bounds: index.between(('a', 1), ('a', 9))
+    * modifying indexed values in place makes the index stale, call .rebuild()
+    """
+
+    def __init__(self, flux, *columns):
+        self.flux    = flux
+        self.columns = columns
+
+        indices = column_indices(flux, columns)
+        getter  = itemgetter(*indices)
+        self._key = lambda row: getter(row.values)
+
+        self._keys    = []
+        self._rows    = []
+        self._version = 0               # incremented on every change, invalidates views
+        self.rebuild()
+
+    def rebuild(self):
+        pairs = sorted(((self._key(row), row) for row in self.flux), key=itemgetter(0))
+
+        self._keys     = [k for k, _ in pairs]
+        self._rows     = [row for _, row in pairs]
+        self._version += 1
+
+    def add(self, rows):
+        """ add rows (already in the flux) to the index """
+        pairs = sorted(((self._key(row), row) for row in rows), key=itemgetter(0))
+        if not pairs:
+            return
+
+        if len(pairs) < insort_threshold:
+            for k, row in pairs:
+                i = bisect_right(self._keys, k)
+                self._keys.insert(i, k)
+                self._rows.insert(i, row)
+        else:
+            merged = list(merge(zip(self._keys, self._rows), pairs, key=itemgetter(0)))
+            self._keys = [k for k, _ in merged]
+            self._rows = [row for _, row in merged]
+
+        self._version += 1
+
+    def append_rows(self, rows):
+        """ flux.append_rows(rows), then index the new rows """
+        r_1 = self.flux.num_rows + 1
+        self.flux.append_rows(rows)
+
+        self.add(row_view_cls(self.flux, r_1))
+
+    def __view(self, i_1, i_2):
+        return index_view_cls(self, i_1, max(i_1, i_2))
+
+    def eq(self, value):
+        return self.__view(bisect_left(self._keys, value),
+                           bisect_right(self._keys, value))
+
+    def between(self, lo, hi, inclusive=(True, False)):
+        """ default lo <= key < hi, like range() """
+        lo_inclusive, hi_inclusive = inclusive
+
+        i_1 = bisect_left(self._keys, lo)  if lo_inclusive else bisect_right(self._keys, lo)
+        i_2 = bisect_right(self._keys, hi) if hi_inclusive else bisect_left(self._keys, hi)
+
+        return self.__view(i_1, i_2)
+
+    def ge(self, value):
+        return self.__view(bisect_left(self._keys, value), len(self._keys))
+
+    def gt(self, value):
+        return self.__view(bisect_right(self._keys, value), len(self._keys))
+
+    def le(self, value):
+        return self.__view(0, bisect_right(self._keys, value))
+
+    def lt(self, value):
+        return self.__view(0, bisect_left(self._keys, value))
+
+    def prefix(self, s):
+        """ string keys starting with s (first column of a multi-column index) """
+        if not s:
+            return self.__view(0, len(self._keys))
+
+        hi = s[:-1] + chr(ord(s[-1]) + 1)
+        if len(self.columns) > 1:
+            s  = (s,)
+            hi = (hi,)
+
+        return self.__view(bisect_left(self._keys, s),
+                           bisect_left(self._keys, hi))
+
+    def min(self):
+        return self._rows[0]
+
+    def max(self):
+        return self._rows[-1]
+
+    def __iter__(self):
+        """ rows in key order """
+        return iter(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __repr__(self):
+        return 'sorted_index_cls({}, {:,} rows)'.format(', '.join(map(str, self.columns)), len(self))
+
+
+class index_view_cls(row_view_cls):
+    """ row_view_cls over a sorted_index_cls, invalidated by the next change to the index """
+
+    def __init__(self, index, i_1, i_2):
+        m = index.flux.matrix
+        super().__init__(index._rows, i_1, i_2, header_row=m[0] if m else None)
+
+        self._index   = index
+        self._version = index._version
+
+    def __check(self):
+        if self._version != self._index._version:
+            raise RuntimeError('sorted_index_cls has changed since this view was returned, repeat the lookup')
+
+    def __getitem__(self, i):
+        self.__check()
+        if not isinstance(i, slice):
+            return super().__getitem__(i)
+
+        view = index_view_cls.from_range(self._matrix, self._range[i], self._header_row)
+        view._index   = self._index
+        view._version = self._version
+
+        return view
+
+    def __iter__(self):
+        self.__check()
+        return super().__iter__()
+
+    def __reversed__(self):
+        self.__check()
+        return super().__reversed__()
+
+    def __len__(self):
+        self.__check()
+        return super().__len__()
@@ -0,0 +1,249 @@
+"""
+always-on instrumentation for flux_cls hot paths
+    * call counters and timing histograms (log2 nanosecond buckets)
+    * cheap enough to leave enabled in production: one flag check per
+      call when disabled, two perf_counter_ns() calls when timed
+    * sample_every: time only every n-th call (all calls are still counted)
+    * enabled by enable(), or by the FLUX_INSTRUMENT environment variable
+    * dump() / report() can be called at any time without stopping anything
+    * with instrumented_flux_cls(): flux_cls methods are only wrapped inside the block
+
+unlike line_profiler / print_runtime, nothing needs to be toggled
+or re-run to find out where time is going
+"""
+import functools
+import inspect
+import json
+import os
+import time
+
+from contextlib import contextmanager
+
+from vengeance import flux_cls
+
+flux_methods = ('map_rows',
+                'map_rows_append',
+                'filter',
+                'filtered',
+                'filter_by_unique',
+                'sort',
+                'sorted',
+                'unique',
+                '__setitem__',
+                'append_rows',
+                'insert_rows',
+                'to_csv',
+                'to_json',
+                'serialize',
+                'from_csv',
+                'from_json',
+                'deserialize')
+
+enabled      = os.environ.get('FLUX_INSTRUMENT', '') not in ('', '0')
+sample_every = 1
+instruments  = {}
+
+
+class instrument_cls:
+    __slots__ = ('name',
+                 'calls',
+                 'timed',
+                 'total_ns',
+                 'min_ns',
+                 'max_ns',
+                 'buckets')
+
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.calls    = 0
+        self.timed    = 0
+        self.total_ns = 0
+        self.min_ns   = None
+        self.max_ns   = 0
+        self.buckets  = [0] * 64
+
+    def record(self, ns):
+        self.timed    += 1
+        self.total_ns += ns
+
+        if self.min_ns is None or ns < self.min_ns:
+            self.min_ns = ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+        self.buckets[min(ns.bit_length(), 63)] += 1
+
+    def percentile(self, p):
+        """ approximate percentile: upper bound of the log2 bucket, in nanoseconds """
+        if self.timed == 0:
+            return None
+
+        threshold = self.timed * p / 100
+        n = 0
+        for b, count in enumerate(self.buckets):
+            n += count
+            if n >= threshold:
+                return min(1 << b, self.max_ns)
+
+        return self.max_ns
+
+    def dict(self):
+        mean_ns = self.total_ns / self.timed if self.timed else None
+
+        return {'name':      self.name,
+                'calls':     self.calls,
+                'timed':     self.timed,
+                'total_ms':  self.total_ns / 1e6,
+                'mean_ms':   None if mean_ns is None else mean_ns / 1e6,
+                'min_ms':    None if self.min_ns is None else self.min_ns / 1e6,
+                'p50_ms':    self.__ms(self.percentile(50)),
+                'p95_ms':    self.__ms(self.percentile(95)),
+                'max_ms':    self.max_ns / 1e6,
+                'histogram': {1 << b: count for b, count in enumerate(self.buckets) if count}}
+
+    @staticmethod
+    def __ms(ns):
+        if ns is None:
+            return None
+
+        return ns / 1e6
+
+    def __repr__(self):
+        return 'instrument_cls({}, calls: {:,})'.format(self.name, self.calls)
+
+
+def enable(every=1):
+    global enabled
+    global sample_every
+
+    enabled      = True
+    sample_every = max(int(every), 1)
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def instrument(name=None):
+    """ decorator
+
+    @instrument('io.read_csv')
+    def read_csv(path):
+        ...
+    """
+    def decorator(f):
+        inst = instruments.setdefault(name or f.__qualname__, instrument_cls(name or f.__qualname__))
+
+        @functools.wraps(f)
+        def instrumented_f(*args, **kwargs):
+            if not enabled:
+                return f(*args, **kwargs)
+
+            inst.calls += 1
+            if inst.calls % sample_every:
+                return f(*args, **kwargs)
+
+            t_1 = time.perf_counter_ns()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                inst.record(time.perf_counter_ns() - t_1)
+
+        instrumented_f.__instrumented__ = f
+        return instrumented_f
+
+    return decorator
+
+
+def instrument_flux_cls(cls=flux_cls, methods=flux_methods):
+    """
+    wrap methods of flux_cls (or a subclass) in place, safe to call more than once
+
+    returns the names of the methods wrapped by this call
+    """
+    wrapped = []
+    for method_name in methods:
+        try:
+            attr = inspect.getattr_static(cls, method_name)
+        except AttributeError:
+            continue
+
+        name = '{}.{}'.format(cls.__name__, method_name)
+
+        if isinstance(attr, (classmethod, staticmethod)):
+            f = attr.__func__
+            if hasattr(f, '__instrumented__'):
+                continue
+            setattr(cls, method_name, type(attr)(instrument(name)(f)))
+            wrapped.append(method_name)
+        elif callable(attr) and not hasattr(attr, '__instrumented__'):
+            setattr(cls, method_name, instrument(name)(attr))
+            wrapped.append(method_name)
+
+    return wrapped
+
+
+def uninstrument_flux_cls(cls=flux_cls, methods=None):
+    """ restore wrapped methods, all of them if methods is None """
+    for method_name, attr in list(vars(cls).items()):
+        if methods is not None and method_name not in methods:
+            continue
+
+        if isinstance(attr, (classmethod, staticmethod)):
+            f = getattr(attr.__func__, '__instrumented__', None)
+            if f is not None:
+                setattr(cls, method_name, type(attr)(f))
+        elif hasattr(attr, '__instrumented__'):
+            setattr(cls, method_name, attr.__instrumented__)
+
+
+@contextmanager
+def instrumented_flux_cls(cls=flux_cls, methods=flux_methods):
+    """
+    with instrumented_flux_cls():
+        ...
+
+    methods are only wrapped inside the block, other importers of flux_cls are left alone
+    """
+    wrapped = instrument_flux_cls(cls, methods)
+    try:
+        yield cls
+    finally:
+        uninstrument_flux_cls(cls, wrapped)
+
+
+def dump(path=None):
+    d = [inst.dict() for inst in instruments.values() if inst.calls]
+
+    if path is None:
+        return d
+
+    with open(path, 'w') as f:
+        json.dump(d, f, indent=4)
+
+
+def report():
+    m = [('name', 'calls', 'timed', 'total ms', 'mean ms', 'p50 ms', 'p95 ms', 'max ms')]
+    for d in sorted(dump(), key=lambda d: d['total_ms'], reverse=True):
+        m.append((d['name'],
+                  '{:,}'.format(d['calls']),
+                  '{:,}'.format(d['timed']),
+                  *('-' if d[k] is None else '{:,.3f}'.format(d[k])
+                    for k in ('total_ms', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms'))))
+
+    widths = [max(len(row[c]) for row in m) for c in range(len(m[0]))]
+    lines  = ['  '.join(v.ljust(w) if c == 0 else v.rjust(w)
+                        for c, (v, w) in enumerate(zip(row, widths)))
+              for row in m]
+    lines.insert(1, '-' * len(lines[0]))
+
+    return '\n'.join(lines)
+
+
+def reset():
+    for inst in instruments.values():
+        inst.reset()
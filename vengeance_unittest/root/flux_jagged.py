@@ -0,0 +1,161 @@
+"""
+width_tracker_cls
+    * incremental row-width statistics for a flux_cls
+    * flux.is_jagged() and flux.jagged_rows() scan the length of every row;
+      rows added or modified through the tracker are measured once, when
+      they change, so is_jagged() is O(1) and jagged_rows() only walks
+      known offenders
+    * repair() pads / truncates known offenders to the header width
+"""
+from collections import Counter
+
+
+class width_tracker_cls:
+    """
+    tracker = width_tracker_cls(flux)           # one full scan
+    tracker.append_rows(batch)                  # only new rows are measured
+    if tracker.is_jagged():
+        tracker.repair()
+
+    * changes made directly to row.values (bypassing the tracker) are not seen;
+      call .rescan() after those
+    * if the number of header columns changes, the next query rescans automatically
+    """
+
+    def __init__(self, flux):
+        self.flux = flux
+
+        self.widths    = Counter()          # {row width: number of rows}
+        self._jagged   = {}                 # {id(row): (row, measured width)}
+        self._num_cols = None
+
+        self.rescan()
+
+    def rescan(self):
+        self.widths.clear()
+        self._jagged.clear()
+        self._num_cols = self.flux.num_cols
+
+        for row in self.flux:
+            self.__measure(row)
+
+    def __measure(self, row):
+        w = len(row.values)
+        self.widths[w] += 1
+
+        if w != self._num_cols:
+            self._jagged[id(row)] = (row, w)
+
+    def __unmeasure(self, row):
+        """ remove row's width as it was last measured """
+        _, w = self._jagged.pop(id(row), (row, self._num_cols))
+
+        self.widths[w] -= 1
+        if not self.widths[w]:
+            del self.widths[w]
+
+    def __check_header_width(self):
+        if self.flux.num_cols != self._num_cols:
+            self.rescan()
+
+    # region {modifications through the tracker}
+    def append_rows(self, rows):
+        r_1 = len(self.flux.matrix)
+        self.flux.append_rows(rows)
+
+        for row in self.flux.matrix[r_1:]:
+            self.__measure(row)
+
+    def insert_rows(self, i, rows):
+        n_1 = len(self.flux.matrix)
+        self.flux.insert_rows(i, rows)
+        n_2 = len(self.flux.matrix)
+
+        if i == 0:
+            # new header row, every width is relative to it
+            self.rescan()
+            return
+
+        for row in self.flux.matrix[i:i + (n_2 - n_1)]:
+            self.__measure(row)
+
+    def set_values(self, row, values):
+        """ row.values = values """
+        self.__unmeasure(row)
+        row.values = values
+        self.__measure(row)
+
+    def extend_values(self, row, values):
+        """ row.values.extend(values) """
+        self.__unmeasure(row)
+        row.values.extend(values)
+        self.__measure(row)
+
+    def delete_rows(self, r_1, r_2=None):
+        """ del flux.matrix[r_1:r_2], r_1 must be >= 1 (header row can't be deleted) """
+        if r_1 < 1:
+            raise IndexError('header row cannot be deleted through width_tracker_cls')
+
+        for row in self.flux.matrix[r_1:r_2]:
+            self.__unmeasure(row)
+
+        del self.flux.matrix[r_1:r_2]
+    # endregion
+
+    def is_jagged(self):
+        self.__check_header_width()
+        return bool(self._jagged)
+
+    def jagged_rows(self):
+        """ known offenders only, rows that were fixed since they were measured are dropped """
+        self.__check_header_width()
+
+        for row, _ in list(self._jagged.values()):
+            if len(row.values) == self._num_cols:
+                self.__unmeasure(row)
+                self.__measure(row)
+                continue
+
+            yield row
+
+    def repair(self, fill=None):
+        """ pad short rows with fill, truncate long rows, known offenders only """
+        self.__check_header_width()
+        num_cols = self._num_cols
+
+        for row in list(self.jagged_rows()):
+            values = row.values
+            self.__unmeasure(row)
+
+            if len(values) < num_cols:
+                values.extend([fill] * (num_cols - len(values)))
+            else:
+                del values[num_cols:]
+
+            self.__measure(row)
+
+    def stats(self):
+        self.__check_header_width()
+
+        return {'num_cols':    self._num_cols,
+                'num_rows':    sum(self.widths.values()),
+                'num_jagged':  len(self._jagged),
+                'min_width':   min(self.widths, default=None),
+                'max_width':   max(self.widths, default=None),
+                'widths':      dict(self.widths)}
+
+    def __repr__(self):
+        return 'width_tracker_cls({:,} jagged rows)'.format(len(self._jagged))
+
+
+def repair_all(flux, fill=None):
+    """ full scan version of width_tracker_cls.repair(), for a flux without a tracker """
+    num_cols = flux.num_cols
+
+    for row in flux:
+        values = row.values
+        w = len(values)
+        if w < num_cols:
+            values.extend([fill] * (num_cols - w))
+        elif w > num_cols:
+            del values[num_cols:]
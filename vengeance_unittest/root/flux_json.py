@@ -0,0 +1,204 @@
+"""
+streaming json / ndjson reader
+    * flux_cls.from_json() loads the whole document with json.load() before
+      any rows are built, holding both the text and every parsed object at once;
+      here the file is read in chunks and each row is decoded and converted
+      as soon as it's complete, so peak memory is close to the size of the result
+    * formats:
+        json array of objects       [{"col_a": 1, "col_b": 2}, ...]
+        json array of lists         [["col_a", "col_b"], [1, 2], ...]   (first list is the header row)
+        ndjson / json lines         one object, or one list, per line
+    * columns: read only these columns (projection), nrows: stop after this many rows
+    * iter_json_chunks(): flux_cls batches of chunk_rows rows
+
+    flux = flux_json.from_json(path, columns=['col_a', 'col_b'], nrows=1_000)
+"""
+import json
+
+from itertools import islice
+
+from vengeance import flux_cls
+
+read_size   = 64 * 1024
+whitespace  = ' \t\n\r'
+
+decoder = json.JSONDecoder()
+
+
+def iter_json_values(f, chunk_size=read_size):
+    """
+    top-level values from a json array (its elements) or an ndjson stream (each line)
+
+    :param f: text file object
+    """
+    buf = f.read(chunk_size)
+    eof = not buf
+    i   = 0
+
+    def read_more(buf, i):
+        chunk = f.read(chunk_size)
+        return buf[i:] + chunk, 0, not chunk
+
+    # skip leading whitespace / byte order mark
+    while True:
+        while i < len(buf) and (buf[i] in whitespace or buf[i] == '\ufeff'):
+            i += 1
+        if i < len(buf) or eof:
+            break
+        buf, i, eof = read_more(buf, i)
+
+    if i >= len(buf):
+        return
+
+    is_array = False
+    if buf[i] == '[':
+        # '[[' or '[{' is an array of rows, '["a", ...' is an ndjson line of values
+        j = i + 1
+        while True:
+            while j < len(buf) and buf[j] in whitespace:
+                j += 1
+            if j < len(buf) or eof:
+                break
+            buf, i, eof = read_more(buf, i)
+            j = 1
+
+        is_array = j >= len(buf) or buf[j] in '[{]'
+        if is_array:
+            i = j
+
+    while True:
+        # separators: whitespace, and commas between array elements
+        while True:
+            while i < len(buf) and (buf[i] in whitespace or (is_array and buf[i] == ',')):
+                i += 1
+            if i < len(buf) or eof:
+                break
+            buf, i, eof = read_more(buf, i)
+
+        if i >= len(buf):
+            if is_array:
+                raise ValueError('invalid json: unterminated array')
+            return
+
+        if is_array and buf[i] == ']':
+            return
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, i)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                buf, i, eof = read_more(buf, i)
+                continue
+
+            if end == len(buf) and not eof:
+                # a number (or the whole value) may continue in the next chunk
+                buf, i, eof = read_more(buf, i)
+                continue
+
+            break
+
+        yield value
+        i = end
+
+        if i > chunk_size:
+            buf, i = buf[i:], 0
+
+
+def iter_json_rows(path, encoding='utf-8', columns=None, nrows=None, chunk_size=read_size):
+    """
+    yields the header row, then each row as a list of values
+
+    * rows of json objects take their header names from the first object
+      (or from columns); keys missing from later objects are None
+    * columns: header names to keep, in this order
+
+    :param path: file path or text file object
+    """
+    if isinstance(path, str):
+        with open(path, 'r', encoding=encoding) as f:
+            yield from iter_json_rows(f, encoding, columns, nrows, chunk_size)
+        return
+
+    values = iter_json_values(path, chunk_size)
+
+    first = next(values, None)
+    if first is None:
+        if columns is not None:
+            yield list(columns)
+        return
+
+    if isinstance(first, dict):
+        header_names = list(columns) if columns is not None else list(first)
+
+        yield header_names
+        rows = __dict_rows(first, values, header_names)
+    elif isinstance(first, list):
+        header_names = first
+        if columns is None:
+            yield header_names
+            rows = values
+        else:
+            indices = __column_indices(header_names, columns)
+            yield list(columns)
+            rows = ([row[c] for c in indices] for row in values)
+    else:
+        raise ValueError('json rows must be objects or lists, not {}'.format(type(first).__name__))
+
+    if nrows is not None:
+        rows = islice(rows, nrows)
+
+    yield from rows
+
+
+def __dict_rows(first, values, header_names):
+    yield [first.get(h) for h in header_names]
+    for d in values:
+        yield [d.get(h) for h in header_names]
+
+
+def __column_indices(header_names, columns):
+    positions = {h: i for i, h in enumerate(header_names)}
+    try:
+        return [positions[h] for h in columns]
+    except KeyError as e:
+        raise ValueError('column {} not in json header row {}'.format(e, header_names)) from None
+
+
+def from_json(path, encoding='utf-8', columns=None, nrows=None):
+    """ flux_cls.from_json(), read incrementally """
+    rows = iter_json_rows(path, encoding, columns, nrows)
+
+    m = list(rows)
+    if not m:
+        return flux_cls()
+
+    return flux_cls(m)
+
+
+def iter_json_chunks(path, encoding='utf-8', columns=None, nrows=None, chunk_rows=100_000):
+    """ yields flux_cls batches of at most chunk_rows rows, each with the header row """
+    rows = iter_json_rows(path, encoding, columns, nrows)
+
+    header_names = next(rows, None)
+    if header_names is None:
+        return
+
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            break
+
+        yield flux_cls([header_names] + chunk)
+
+
+def to_ndjson(flux, path, encoding='utf-8', **kwargs):
+    """ one json object per row, readable by iter_json_rows() without parsing the whole file """
+    header_names = flux.header_names()
+    dumps        = json.JSONEncoder(**kwargs).encode
+
+    with open(path, 'w', encoding=encoding) as f:
+        for values in flux.rows(1):
+            f.write(dumps(dict(zip(header_names, values))))
+            f.write('\n')
@@ -0,0 +1,257 @@
+"""
+flux_cls memory accounting and budgets
+    * memory_usage(): bytes used by the matrix list, row objects, value lists
+      and (deep=True) the cell values of each column
+    * objects referenced more than once, like the rows in
+          [['same_address_a', 'same_address_b', 'same_address_c']] * 1_000
+      are counted once, and reported separately as shared
+    * memory_budget_cls: raise MemoryError (or spill rows to a callback)
+      before a load or append takes the flux over a byte budget; each flux is
+      measured once, then kept as a running total of the estimated appended rows
+"""
+import csv
+import random
+import sys
+
+from itertools import islice
+
+from vengeance import flux_cls
+from vengeance.classes.flux_row_cls import flux_row_cls
+
+container_types = (list, tuple, set, frozenset, dict)
+
+
+def row_overhead(row=None):
+    """
+    bytes per row besides its values: flux_row_cls object, its __dict__ and the matrix slot
+
+    :param row: an existing row to measure (eg, flux.matrix[-1]); instance __dict__ sizes
+                depend on the interpreter's key sharing, so a row already in the flux
+                is measured the way memory_usage() will measure the new rows
+    """
+    if row is None:
+        row = flux_row_cls({}, [])
+
+    size = sys.getsizeof(row) + 8
+    if hasattr(row, '__dict__'):
+        size += sys.getsizeof(vars(row))
+
+    return size
+
+
+def deep_sizeof(o, seen):
+    """ size of o and everything it contains, skipping ids already in seen """
+    if id(o) in seen:
+        return 0
+
+    seen.add(id(o))
+    size = sys.getsizeof(o)
+
+    if isinstance(o, dict):
+        for k, v in o.items():
+            size += deep_sizeof(k, seen) + deep_sizeof(v, seen)
+    elif isinstance(o, container_types):
+        for v in o:
+            size += deep_sizeof(v, seen)
+    elif hasattr(o, '__dict__'):
+        size += deep_sizeof(vars(o), seen)
+
+    return size
+
+
+def memory_usage(flux, deep=True, sample=None):
+    """
+    {'matrix':       bytes of the flux.matrix list itself
+     'row_objects':  bytes of flux_row_cls objects (and their __dict__)
+     'value_lists':  bytes of row.values lists
+     'columns':      {header: bytes of cell values}         (deep=True only)
+     'shared':       {'value_lists': number of aliased value lists,
+                      'cells':       number of cell references to an already counted object}
+     'total':        sum of the above}
+
+    :param sample: measure only this many random rows and extrapolate,
+                   for a quick estimate on very large matrices
+    """
+    m = flux.matrix
+    n = max(len(m) - 1, 0)
+
+    scale = 1.0
+    if sample is not None and sample < n:
+        rows  = [m[i] for i in random.sample(range(1, n + 1), sample)]
+        scale = n / sample
+    else:
+        rows  = islice(m, 1, None)
+
+    seen         = set()
+    header_names = flux.header_names()
+
+    usage = {'matrix':      sys.getsizeof(m),
+             'row_objects': 0,
+             'value_lists': 0,
+             'columns':     {h: 0 for h in header_names} if deep else None,
+             'shared':      {'value_lists': 0, 'cells': 0}}
+
+    for row in rows:
+        usage['row_objects'] += sys.getsizeof(row)
+        if hasattr(row, '__dict__'):
+            usage['row_objects'] += sys.getsizeof(vars(row))
+
+        values = row.values
+        if id(values) in seen:
+            usage['shared']['value_lists'] += 1
+            continue
+
+        seen.add(id(values))
+        usage['value_lists'] += sys.getsizeof(values)
+
+        if not deep:
+            continue
+
+        for h, v in zip(header_names, values):
+            size = deep_sizeof(v, seen)
+            if size == 0:
+                usage['shared']['cells'] += 1
+            usage['columns'][h] += size
+
+    if scale != 1.0:
+        usage['row_objects'] = int(usage['row_objects'] * scale)
+        usage['value_lists'] = int(usage['value_lists'] * scale)
+        if deep:
+            usage['columns'] = {h: int(size * scale) for h, size in usage['columns'].items()}
+
+    usage['total'] = (usage['matrix'] +
+                      usage['row_objects'] +
+                      usage['value_lists'] +
+                      (sum(usage['columns'].values()) if deep else 0))
+
+    return usage
+
+
+def print_memory_usage(flux, deep=True, sample=None):
+    usage = memory_usage(flux, deep, sample)
+
+    print()
+    print('{:<20} {:>14,}'.format('matrix', usage['matrix']))
+    print('{:<20} {:>14,}'.format('row objects', usage['row_objects']))
+    print('{:<20} {:>14,}'.format('value lists', usage['value_lists']))
+    if deep:
+        for h, size in usage['columns'].items():
+            print('{:<20} {:>14,}'.format('  ' + str(h), size))
+
+    print('{:<20} {:>14,}'.format('shared value lists', usage['shared']['value_lists']))
+    print('{:<20} {:>14,}'.format('shared cells', usage['shared']['cells']))
+    print('{:<20} {:>14,}'.format('total', usage['total']))
+
+
+class memory_budget_cls:
+    """
+    budget = memory_budget_cls(2 * 1024**3)
+    flux   = budget.from_csv(path)              # raises MemoryError before going over budget
+    budget.append_rows(flux, rows)
+
+    :param spill: optional function called with a full flux_cls instead of raising
+                  MemoryError (eg, write it to disk); loading continues in an empty
+                  flux, or the flux's rows are cleared for append_rows()
+    :param sample: rows measured per batch to estimate its size
+    """
+
+    def __init__(self, max_bytes, spill=None, sample=1_000):
+        self.max_bytes = max_bytes
+        self.spill     = spill
+        self.sample    = sample
+
+        self._used = {}         # {id(flux): (flux, bytes)}, running totals for append_rows()
+
+    def estimate(self, rows, flux=None):
+        """ estimated bytes of a batch of primitive rows, as they would be held in flux """
+        rows = rows if isinstance(rows, list) else list(rows)
+        if not rows:
+            return 0
+
+        measured = rows if len(rows) <= self.sample else random.sample(rows, self.sample)
+
+        # values are held as a list (getsizeof([]) + one 8-byte slot per value), whatever the input type
+        seen = set()
+        size = 0
+        for r in measured:
+            values = getattr(r, 'values', r)
+            size  += sys.getsizeof([]) + 8 * len(values)
+            size  += sum(deep_sizeof(v, seen) for v in values)
+
+        size = size * len(rows) / len(measured)
+
+        overhead = row_overhead(flux.matrix[-1] if flux is not None and flux.matrix else None)
+
+        return int(size + overhead * len(rows))
+
+    def check(self, flux, additional_bytes=0):
+        """ measures flux (sampled), eg after changes made outside the budget; resets its running total """
+        used = memory_usage(flux, deep=True, sample=self.sample)['total']
+        self._used[id(flux)] = (flux, used)
+
+        if used + additional_bytes > self.max_bytes:
+            raise MemoryError('flux would use {:,} bytes, over budget of {:,} bytes'
+                              .format(used + additional_bytes, self.max_bytes))
+
+        return used
+
+    def used(self, flux):
+        """ running total for flux: measured once, then increased by each append_rows() estimate """
+        item = self._used.get(id(flux))
+        if item is None or item[0] is not flux:
+            return self.check(flux)
+
+        return item[1]
+
+    def append_rows(self, flux, rows):
+        rows = rows if isinstance(rows, list) else list(rows)
+
+        used       = self.used(flux)
+        additional = self.estimate(rows, flux)
+        if used + additional > self.max_bytes:
+            if self.spill is None:
+                raise MemoryError('flux would use {:,} bytes, over budget of {:,} bytes'
+                                  .format(used + additional, self.max_bytes))
+
+            self.spill(flux)
+            del flux.matrix[1:]
+            used = memory_usage(flux, deep=False)['total']
+
+        flux.append_rows(rows)
+        self._used[id(flux)] = (flux, used + additional)
+
+    def release(self, flux):
+        """ stop tracking flux """
+        self._used.pop(id(flux), None)
+
+    def from_csv(self, path, encoding='utf-8', chunk_size=100_000, **kwargs):
+        """
+        reads in chunks, checking the estimated size of the flux after each one;
+        kwargs are passed to csv.reader (values are read as strings, like flux_cls.from_csv)
+        """
+        with open(path, 'r', encoding=encoding, newline='') as f:
+            reader = csv.reader(f, **kwargs)
+
+            header = next(reader, None)
+            flux   = flux_cls([header]) if header else flux_cls()
+            used   = 0
+
+            while True:
+                chunk = list(islice(reader, chunk_size))
+                if not chunk:
+                    break
+
+                additional = self.estimate(chunk, flux)
+                if used + additional > self.max_bytes:
+                    if self.spill is None:
+                        raise MemoryError("reading '{}' would use over {:,} bytes, budget is {:,} bytes"
+                                          .format(path, used + additional, self.max_bytes))
+
+                    self.spill(flux)
+                    flux = flux_cls([header])
+                    used = 0
+
+                flux.append_rows(chunk)
+                used += additional
+
+        return flux
@@ -0,0 +1,210 @@
+"""
+mmap_flux_cls
+    * read-only flux over a file written by to_mmap_file()
+    * file is memory-mapped, rows are only decoded when accessed
+    * opening is near-instant regardless of file size, and every process
+      that maps the same file shares a single page-cache copy
+
+file layout
+    magic | row blobs (pickled tuples, header row first) | row offsets | footer
+"""
+import mmap
+import pickle
+import struct
+import sys
+
+from array import array
+
+from vengeance import flux_cls
+from vengeance.classes.flux_row_cls import flux_row_cls
+
+magic      = b'VENFLUX\x01'
+footer_fmt = '<QQ8s'
+footer_len = struct.calcsize(footer_fmt)
+
+
+def to_mmap_file(flux, path):
+    """
+    :param flux: flux_cls, or a list-of-lists matrix with headers in first row
+    """
+    m = flux.matrix if isinstance(flux, flux_cls) else flux
+
+    offsets = array('Q')
+    with open(path, 'wb') as f:
+        f.write(magic)
+
+        for row in m:
+            values = row.values if isinstance(row, flux_row_cls) else row
+            offsets.append(f.tell())
+            f.write(pickle.dumps(tuple(values), pickle.HIGHEST_PROTOCOL))
+
+        offsets.append(f.tell())
+        offsets_pos = f.tell()
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+
+        f.write(offsets.tobytes())
+        f.write(struct.pack(footer_fmt, offsets_pos, len(m), magic))
+
+
+class mmap_flux_cls:
+    """
+    with mmap_flux_cls(path) as flux:
+        for row in flux:
+            ...
+
+    * flux.matrix[0] is the header row, same as flux_cls
+    * columns: optional column projection, only those columns are
+      exposed on rows (values are still unpickled per row)
+    * modifications are not supported, use .to_flux() for a
+      mutable copy of a range of rows
+    """
+
+    def __init__(self, path, columns=None):
+        self.path = path
+
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(magic)] != magic:
+            self._mm.close()
+            raise ValueError("'{}' is not an mmap flux file".format(path))
+
+        offsets_pos, num_blobs, _ = struct.unpack(footer_fmt, self._mm[-footer_len:])
+        self._offsets = self.__load_offsets(offsets_pos, num_blobs)
+        self._num_blobs = num_blobs
+
+        header_names = list(self.__decode(0)) if num_blobs else []
+        if columns is None:
+            self._col_indices = None
+            self.headers = {h: i for i, h in enumerate(header_names)}
+        else:
+            self._col_indices = [header_names.index(c) if isinstance(c, str) else c
+                                 for c in columns]
+            self.headers = {header_names[c]: i for i, c in enumerate(self._col_indices)}
+
+        self.matrix = mmap_matrix_cls(self)
+
+    def __load_offsets(self, offsets_pos, num_blobs):
+        offsets = memoryview(self._mm)[offsets_pos:offsets_pos + (num_blobs + 1) * 8]
+
+        if sys.byteorder == 'little':
+            return offsets.cast('Q')                # zero-copy view into mmap
+
+        a = array('Q', offsets.tobytes())
+        a.byteswap()
+        offsets.release()
+        return a
+
+    def __decode(self, i):
+        return pickle.loads(self._mm[self._offsets[i]:self._offsets[i + 1]])
+
+    def _values(self, i):
+        values = self.__decode(i)
+        if self._col_indices is None:
+            return list(values)
+
+        return [values[c] for c in self._col_indices]
+
+    @property
+    def num_rows(self):
+        return max(self._num_blobs - 1, 0)
+
+    @property
+    def num_cols(self):
+        return len(self.headers)
+
+    def header_names(self):
+        return list(self.headers.keys())
+
+    def is_empty(self):
+        return self.num_rows == 0
+
+    def rows(self, r_1=0, r_2=None):
+        """ rows as primitive values, same indexing as flux_cls.rows(): r_1=0 includes the header row """
+        r_1, r_2, _ = slice(r_1, r_2).indices(self._num_blobs)
+        for i in range(r_1, r_2):
+            yield self._values(i)
+
+    def columns(self, *names):
+        cols = [[] for _ in names]
+        indices = [self.headers[n] if isinstance(n, str) else n for n in names]
+
+        for values in self.rows(1):
+            for col, c in zip(cols, indices):
+                col.append(values[c])
+
+        if len(cols) == 1:
+            return cols[0]
+
+        return cols
+
+    def to_flux(self, r_1=1, r_2=None):
+        """
+        decode a range of rows into a regular (mutable) flux_cls
+
+        * r_1, r_2 index self.matrix, like flux_cls.rows(), but r_1 defaults to 1:
+          the header row is always added, so it is never copied in as a data row
+        """
+        m = [self.header_names()]
+        m.extend(self.rows(max(r_1, 1), r_2))
+
+        return flux_cls(m)
+
+    def close(self):
+        if self._mm.closed:
+            return
+
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+
+        self._mm.close()
+
+    def __getitem__(self, name):
+        return self.columns(name)
+
+    def __iter__(self):
+        for i in range(1, self._num_blobs):
+            yield flux_row_cls(self.headers, self._values(i))
+
+    def __len__(self):
+        return self.num_rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return 'mmap_flux_cls({:,} rows, {} cols) {}'.format(self.num_rows,
+                                                             self.num_cols,
+                                                             self.path)
+
+
+class mmap_matrix_cls:
+    """ read-only row sequence of an mmap_flux_cls, index 0 is the header row """
+
+    def __init__(self, flux):
+        self._flux = flux
+
+    def __getitem__(self, i):
+        flux = self._flux
+
+        if isinstance(i, slice):
+            return [flux_row_cls(flux.headers, flux._values(r_i))
+                    for r_i in range(*i.indices(len(self)))]
+
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('row index out of range')
+
+        return flux_row_cls(flux.headers, flux._values(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __len__(self):
+        return self._flux._num_blobs
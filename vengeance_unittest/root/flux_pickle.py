@@ -0,0 +1,244 @@
+"""
+efficient transfer of flux_cls between processes
+    * flux_payload_cls: column-major, header-once encoding of a flux;
+      int and float columns are packed into arrays and, with pickle
+      protocol 5, handed over as out-of-band buffers (no copy into the pickle stream)
+    * dumps() / loads(): protocol 5 pickling with separate buffers
+    * share_flux() / attach_flux(): one multiprocessing.shared_memory segment
+      per flux, workers receive a small picklable handle instead of the matrix;
+      the segment lives until the owner returned by share_flux() is released
+
+    with flux_pickle.share_flux(flux) as shared:
+        pool.map(worker, [shared.handle] * 16)
+
+    def worker(handle):
+        flux = flux_pickle.attach_flux(handle)
+"""
+import pickle
+import sys
+
+from array import array
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+from vengeance import flux_cls
+
+
+def __typecode(col):
+    """ 'q' for all-int columns, 'd' for all-float columns, None otherwise """
+    if not col:
+        return None
+
+    t = type(col[0])
+    if t is int:
+        typecode = 'q'
+    elif t is float:
+        typecode = 'd'
+    else:
+        return None
+
+    for v in col:
+        if type(v) is not t:
+            return None
+
+    return typecode
+
+
+def encode_column(col):
+    typecode = __typecode(col)
+    if typecode is None:
+        return None, col
+
+    try:
+        return typecode, array(typecode, col)
+    except OverflowError:
+        return None, col
+
+
+class flux_payload_cls:
+    """
+    picklable, column-major snapshot of a flux
+
+    * header names are stored once, instead of once per pickled flux_row_cls
+    * jagged rows are not supported, raises ValueError (see flux_jagged.repair_all())
+    """
+
+    def __init__(self, header_names, columns):
+        self.header_names = header_names
+        self.columns      = columns          # [(typecode, array or list)]
+
+    @classmethod
+    def from_flux(cls, flux):
+        header_names = flux.header_names()
+        if flux.is_jagged():
+            raise ValueError('flux_payload_cls requires a non-jagged flux')
+
+        if flux.is_empty():
+            cols = [[] for _ in header_names]
+        else:
+            cols = [list(col) for col in zip(*flux.rows(1))]
+
+        return cls(header_names, [encode_column(col) for col in cols])
+
+    def to_flux(self):
+        cols = []
+        for typecode, col in self.columns:
+            if typecode is None:
+                cols.append(col)
+            else:
+                cols.append(col.tolist())
+
+        m = [self.header_names]
+        m.extend(map(list, zip(*cols)))
+
+        return flux_cls(m)
+
+    def __reduce_ex__(self, protocol):
+        if protocol < 5:
+            return flux_payload_cls, (self.header_names, self.columns)
+
+        columns = []
+        for typecode, col in self.columns:
+            if typecode is None:
+                columns.append((None, col))
+            else:
+                columns.append((typecode, pickle.PickleBuffer(col)))
+
+        return flux_payload_cls._rebuild, (self.header_names, columns)
+
+    @classmethod
+    def _rebuild(cls, header_names, columns):
+        """
+        numeric buffers are copied into arrays here, so no view of a
+        (possibly shared memory) buffer outlives pickle.loads()
+        """
+        decoded = []
+        for typecode, col in columns:
+            if typecode is None:
+                decoded.append((None, col))
+            else:
+                a = array(typecode)
+                a.frombytes(col)
+                decoded.append((typecode, a))
+
+        return cls(header_names, decoded)
+
+
+def dumps(flux):
+    """ returns (pickled bytes, out-of-band buffers) """
+    buffers = []
+    data = pickle.dumps(flux_payload_cls.from_flux(flux),
+                        protocol=5,
+                        buffer_callback=buffers.append)
+
+    return data, [b.raw() for b in buffers]
+
+
+def loads(data, buffers=()):
+    return pickle.loads(data, buffers=buffers).to_flux()
+
+
+# before python 3.13, attach_flux() unregisters the segment from the resource_tracker (posix only)
+attach_unregisters = sys.version_info < (3, 13) and sys.platform != 'win32'
+
+
+class shared_flux_cls:
+    """
+    owner of a share_flux() segment
+
+    * keeps the creating handle open: on windows, a named segment is destroyed
+      as soon as its last handle is closed
+    * release() closes and unlinks the segment, call it when workers are done
+      (or use it as a context manager)
+    """
+
+    def __init__(self, shm, handle):
+        self.shm    = shm
+        self.handle = handle
+
+    def release(self):
+        if self.shm is None:
+            return
+
+        shm, self.shm = self.shm, None
+        if attach_unregisters:
+            # an attach_flux() sharing this process's resource_tracker (eg, a multiprocessing child)
+            # unregistered the segment; register it again so unlink() can unregister it
+            resource_tracker.register(shm._name, 'shared_memory')
+
+        shm.close()
+        shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def __repr__(self):
+        return 'shared_flux_cls({!r}, released={})'.format(self.handle['name'], self.shm is None)
+
+
+def __attach_segment(name):
+    """
+    attach without taking ownership: before python 3.13, attaching on posix also
+    registers the segment with this process's resource_tracker, which unlinks it
+    when the process exits, while the owner may still be using it
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    shm = shared_memory.SharedMemory(name=name)
+    if attach_unregisters:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+
+    return shm
+
+
+def share_flux(flux):
+    """
+    copy flux into a single shared memory segment
+
+    returns a shared_flux_cls owner: pass owner.handle (small, picklable) to attach_flux(),
+    and call owner.release() when workers are done
+    """
+    data, buffers = dumps(flux)
+
+    size = len(data) + sum(b.nbytes for b in buffers)
+    shm  = shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+    shm.buf[:len(data)] = data
+    offset  = len(data)
+    layouts = []
+    for b in buffers:
+        shm.buf[offset:offset + b.nbytes] = b
+        layouts.append((offset, b.nbytes))
+        offset += b.nbytes
+
+    handle = {'name':     shm.name,
+              'data_len': len(data),
+              'buffers':  layouts}
+
+    return shared_flux_cls(shm, handle)
+
+
+def attach_flux(handle):
+    """
+    build a flux_cls from a share_flux() handle, in any process on the same machine
+
+    :param handle: shared_flux_cls.handle (or the shared_flux_cls itself, in the owning process)
+    """
+    if isinstance(handle, shared_flux_cls):
+        handle = handle.handle
+
+    shm     = __attach_segment(handle['name'])
+    buffers = []
+    try:
+        data    = bytes(shm.buf[:handle['data_len']])
+        buffers = [shm.buf[o:o + n] for o, n in handle['buffers']]
+
+        return loads(data, buffers)
+    finally:
+        for b in buffers:
+            b.release()
+        shm.close()
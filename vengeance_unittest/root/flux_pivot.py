@@ -0,0 +1,157 @@
+"""
+pivot / crosstab and melt (unpivot)
+    * pivot() aggregates in a single hashing pass over the rows,
+      then builds one output row per index key; cost is
+      O(input rows + output cells), with no nested dict building by hand
+    * melt() is the inverse: wide columns back into (variable, value) rows;
+      pivot() records the original column keys on its result (flux.pivot_keys),
+      so melt() restores them instead of their header-name strings
+"""
+from vengeance import flux_cls
+
+from root.examples.flux_columns import column_indices
+from root.examples.flux_columns import key_function
+
+missing = object()
+
+# agg name: (initial accumulator from first value, update, finalize)
+aggregators = {
+    'sum':   (lambda v: v,      lambda acc, v: acc + v,                   lambda acc: acc),
+    'count': (lambda v: 1,      lambda acc, v: acc + 1,                   lambda acc: acc),
+    'min':   (lambda v: v,      lambda acc, v: v if v < acc else acc,     lambda acc: acc),
+    'max':   (lambda v: v,      lambda acc, v: v if v > acc else acc,     lambda acc: acc),
+    'first': (lambda v: v,      lambda acc, v: acc,                       lambda acc: acc),
+    'last':  (lambda v: v,      lambda acc, v: v,                         lambda acc: acc),
+    'mean':  (lambda v: [v, 1], lambda acc, v: [acc[0] + v, acc[1] + 1],  lambda acc: acc[0] / acc[1]),
+    'list':  (lambda v: [v],    lambda acc, v: acc.append(v) or acc,      lambda acc: acc),
+}
+
+
+def resolve_aggregator(agg):
+    if callable(agg):
+        init, update, _ = aggregators['list']
+        return init, update, agg
+
+    try:
+        return aggregators[agg]
+    except KeyError:
+        raise ValueError("invalid aggregate: '{}', must be one of {} or a function"
+                         .format(agg, tuple(aggregators))) from None
+
+
+def __header_name(k, prefix):
+    if isinstance(k, tuple):
+        k = '_'.join(str(v) for v in k)
+
+    return '{}{}'.format(prefix, k)
+
+
+def pivot(flux, index, columns, values=None, agg='sum', fill=None, prefix=''):
+    """
+    pivot(flux, 'name', 'date', 'apples_sold', agg='sum', fill=0)
+
+        name   | 2019-01-01 | 2019-01-02 | ...
+        alice  |          2 |          4 |
+        bob    |          5 |          3 |
+
+    :param index:   column(s) that identify output rows
+    :param columns: column(s) whose values become output headers, in order of first appearance
+    :param values:  column to aggregate, None for counts
+    :param agg:     'sum', 'count', 'mean', 'min', 'max', 'first', 'last', 'list'
+                    or a function called with the list of values in each cell
+    :param prefix:  prepended to generated header names, eg prefix='sold_'
+
+    raises ValueError if generated header names collide with each other
+    or with index column names (eg, keys 1 and '1'), use prefix= to separate them
+    """
+    if values is None:
+        agg = 'count'
+
+    init, update, finalize = resolve_aggregator(agg)
+
+    ik = key_function(flux, index)
+    ck = key_function(flux, columns)
+    vi = column_indices(flux, values)[0] if values is not None else 0
+
+    cells      = {}
+    index_keys = {}
+    col_keys   = {}
+    for row in flux.rows(1):
+        k_i = ik(row)
+        k_c = ck(row)
+        v   = row[vi]
+
+        k = (k_i, k_c)
+        if k in cells:
+            cells[k] = update(cells[k], v)
+        else:
+            cells[k] = init(v)
+            index_keys[k_i] = None
+            col_keys[k_c]   = None
+
+    index_names = [flux.header_names()[i] for i in column_indices(flux, index)]
+    col_names   = [__header_name(k_c, prefix) for k_c in col_keys]
+    __validate_header_names(index_names, col_names)
+
+    m = [index_names + col_names]
+    for k_i in index_keys:
+        row = list(k_i) if isinstance(k_i, tuple) else [k_i]
+
+        for k_c in col_keys:
+            acc = cells.get((k_i, k_c), missing)
+            row.append(fill if acc is missing else finalize(acc))
+
+        m.append(row)
+
+    flux_b = flux_cls(m)
+    flux_b.pivot_keys = dict(zip(col_names, col_keys))
+
+    return flux_b
+
+
+def __validate_header_names(index_names, col_names):
+    seen = set(index_names)
+    for name in col_names:
+        if name in seen:
+            raise ValueError("pivoted header name '{}' is not unique, use prefix= to separate "
+                             "it from the other column keys and index names".format(name))
+        seen.add(name)
+
+
+def crosstab(flux, index, columns, fill=0):
+    """ counts of each (index, columns) combination """
+    return pivot(flux, index, columns, values=None, agg='count', fill=fill)
+
+
+def melt(flux, id_columns, value_columns=None, var_name='variable', value_name='value', skip_fill=False, fill=None):
+    """
+    inverse of pivot()
+
+    :param value_columns: defaults to all columns not in id_columns
+    :param skip_fill:     omit output rows whose value is fill (eg, cells pivot() filled in)
+
+    variable values are the original column keys if flux came from pivot(), header names otherwise
+    """
+    id_indices = column_indices(flux, id_columns)
+
+    if value_columns is None:
+        value_indices = [i for i in range(flux.num_cols) if i not in id_indices]
+    else:
+        value_indices = column_indices(flux, value_columns)
+
+    header_names = flux.header_names()
+    keys         = getattr(flux, 'pivot_keys', None) or {}
+    value_names  = [(i, keys.get(header_names[i], header_names[i])) for i in value_indices]
+
+    m = [[header_names[i] for i in id_indices] + [var_name, value_name]]
+    for row in flux.rows(1):
+        ids = [row[i] for i in id_indices]
+
+        for i, name in value_names:
+            v = row[i]
+            if skip_fill and v == fill:
+                continue
+
+            m.append(ids + [name, v])
+
+    return flux_cls(m)
@@ -0,0 +1,247 @@
+"""
+declarative filter predicates, evaluated column-wise
+    a closure like
+        def starts_with_a(_row_):
+            return _row_.col_a.startswith('a') or _row_.col_b.startswith('a')
+
+    is called once per row, through flux_row_cls attribute lookups; the same predicate as
+        col('col_a').startswith('a') | col('col_b').startswith('a')
+
+    extracts each referenced column once, evaluates every comparison over the
+    whole column with map() / comprehensions, and combines the results into a row mask
+
+    * comparisons:  ==, !=, <, <=, >, >=, .startswith(), .endswith(), .isin(), .contains(),
+                    .is_none(), .between()
+    * values:       col('col_a')[0] (item / slice of each value), .len()
+    * boolean:      & (and), | (or), ~ (not); the right operand is only evaluated
+                    for rows the left operand leaves undecided, same as python's and / or,
+                    so col('x').is_none() | col('x').startswith('a') never calls None.startswith()
+    * filter() and filtered() accept these predicates or a plain function of a row
+"""
+from itertools import compress
+from itertools import islice
+from operator import eq, ne, lt, le, gt, ge
+from operator import not_
+from operator import methodcaller
+
+from vengeance import flux_cls
+
+from root.examples.flux_columns import column_index
+
+
+class col:
+    """ column value expression """
+
+    def __init__(self, column, transforms=()):
+        self.column     = column
+        self.transforms = transforms
+
+    def __getitem__(self, item):
+        return col(self.column, self.transforms + (('item', item),))
+
+    def len(self):
+        return col(self.column, self.transforms + (('len', None),))
+
+    def values(self, columns, flux, positions=None):
+        """
+        column values with transforms applied, extracted once per evaluation
+
+        :param positions: data row positions to take values from, None for every row
+        """
+        c = column_index(flux, self.column)
+        k = (c, self.transforms)
+        if positions is None and k in columns:
+            return columns[k]
+
+        base = columns.get((c, ()))
+        if base is None:
+            base = columns[(c, ())] = [values[c] for values in flux.rows(1)]
+
+        v = base if positions is None else [base[p] for p in positions]
+        for kind, arg in self.transforms:
+            if kind == 'item':
+                v = [x[arg] for x in v]
+            else:
+                v = list(map(len, v))
+
+        if positions is None:
+            columns[k] = v
+
+        return v
+
+    def __compare(self, op, other):
+        return predicate_cls('compare', self, (op, other))
+
+    def __eq__(self, other):
+        return self.__compare(eq, other)
+
+    def __ne__(self, other):
+        return self.__compare(ne, other)
+
+    def __lt__(self, other):
+        return self.__compare(lt, other)
+
+    def __le__(self, other):
+        return self.__compare(le, other)
+
+    def __gt__(self, other):
+        return self.__compare(gt, other)
+
+    def __ge__(self, other):
+        return self.__compare(ge, other)
+
+    __hash__ = object.__hash__
+
+    def startswith(self, prefix):
+        return predicate_cls('method', self, methodcaller('startswith', prefix))
+
+    def endswith(self, suffix):
+        return predicate_cls('method', self, methodcaller('endswith', suffix))
+
+    def contains(self, s):
+        return predicate_cls('contains', self, s)
+
+    def isin(self, values):
+        return predicate_cls('isin', self, frozenset(values))
+
+    def is_none(self):
+        return predicate_cls('is_none', self, None)
+
+    def between(self, lo, hi):
+        """ lo <= value < hi """
+        return (self >= lo) & (self < hi)
+
+    def __repr__(self):
+        s = 'col({!r})'.format(self.column)
+        for kind, arg in self.transforms:
+            s += '[{!r}]'.format(arg) if kind == 'item' else '.len()'
+
+        return s
+
+
+class predicate_cls:
+
+    def __init__(self, kind, operand, arg):
+        self.kind    = kind
+        self.operand = operand
+        self.arg     = arg
+
+    def __and__(self, other):
+        return predicate_cls('and', self, other)
+
+    def __or__(self, other):
+        return predicate_cls('or', self, other)
+
+    def __invert__(self):
+        return predicate_cls('not', self, None)
+
+    def evaluate(self, flux, columns=None, positions=None):
+        """
+        list of bools, one per row
+
+        :param positions: data row positions to evaluate, None for every row;
+                          the result has one bool per position
+        """
+        if columns is None:
+            columns = {}
+
+        kind = self.kind
+        if kind == 'and':
+            return self.__short_circuit(flux, columns, positions, undecided=True)
+        if kind == 'or':
+            return self.__short_circuit(flux, columns, positions, undecided=False)
+        if kind == 'not':
+            return list(map(not_, self.operand.evaluate(flux, columns, positions)))
+
+        v = self.operand.values(columns, flux, positions)
+        if kind == 'compare':
+            op, other = self.arg
+            return [bool(op(x, other)) for x in v]
+        if kind == 'method':
+            return list(map(self.arg, v))
+        if kind == 'isin':
+            return list(map(self.arg.__contains__, v))
+        if kind == 'contains':
+            s = self.arg
+            return [s in x for x in v]
+        if kind == 'is_none':
+            return [x is None for x in v]
+
+        raise ValueError("invalid predicate kind: '{}'".format(kind))
+
+    def __short_circuit(self, flux, columns, positions, undecided):
+        """ right operand is evaluated only where the left operand is undecided (True for and, False for or) """
+        left = [bool(b) for b in self.operand.evaluate(flux, columns, positions)]
+        if positions is None:
+            positions = range(len(left))
+
+        pending = [p for p, b in zip(positions, left) if b is undecided]
+        if not pending:
+            return left
+
+        right = iter(self.arg.evaluate(flux, columns, pending))
+        return [bool(next(right)) if b is undecided else b for b in left]
+
+    def __call__(self, row):
+        """ fallback: evaluate against a single flux_row_cls, like a filter function """
+        return self.evaluate_row(row)
+
+    def evaluate_row(self, row):
+        kind = self.kind
+        if kind == 'and':
+            return self.operand.evaluate_row(row) and self.arg.evaluate_row(row)
+        if kind == 'or':
+            return self.operand.evaluate_row(row) or self.arg.evaluate_row(row)
+        if kind == 'not':
+            return not self.operand.evaluate_row(row)
+
+        x = row[self.operand.column]
+        for t_kind, t_arg in self.operand.transforms:
+            x = x[t_arg] if t_kind == 'item' else len(x)
+
+        if kind == 'compare':
+            op, other = self.arg
+            return op(x, other)
+        if kind == 'method':
+            return self.arg(x)
+        if kind == 'isin':
+            return x in self.arg
+        if kind == 'contains':
+            return self.arg in x
+
+        return x is None
+
+    def __repr__(self):
+        if self.kind in ('and', 'or'):
+            return '({!r} {} {!r})'.format(self.operand, '&' if self.kind == 'and' else '|', self.arg)
+        if self.kind == 'not':
+            return '~{!r}'.format(self.operand)
+
+        return '{!r}.{}({!r})'.format(self.operand, self.kind, self.arg)
+
+
+def mask(flux, predicate):
+    if isinstance(predicate, predicate_cls):
+        return predicate.evaluate(flux)
+
+    return [bool(predicate(row)) for row in flux]
+
+
+def filter(flux, predicate):
+    """ in-place, like flux.filter() """
+    if not isinstance(predicate, predicate_cls):
+        flux.filter(predicate)
+        return
+
+    flux.matrix[1:] = compress(islice(flux.matrix, 1, None), predicate.evaluate(flux))
+
+
+def filtered(flux, predicate):
+    """ new flux_cls, like flux.filtered() """
+    if not isinstance(predicate, predicate_cls):
+        return flux.filtered(predicate)
+
+    m = [flux.header_names()]
+    m.extend(list(row.values) for row in compress(flux, predicate.evaluate(flux)))
+
+    return flux_cls(m)
@@ -0,0 +1,161 @@
+"""
+command_profiler_cls
+    * per-command profile of flux_cls.execute_commands()
+    * wall time, cpu time, rows in / out, peak memory and
+      net allocated blocks for each command
+    * samples are aggregated across repeated runs, so a regression
+      in one step of a long pipeline stands out without line_profiler
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from statistics import median
+
+
+def command_name(command):
+    if isinstance(command, str):
+        return command
+
+    return command[0]
+
+
+class command_profiler_cls:
+    """
+    profiler = command_profiler_cls()
+    for _ in range(5):
+        flux = flux_custom_cls(m, 'apples')
+        profiler.execute_commands(flux, flux.commands)
+
+    print(profiler.report())
+    s = profiler.to_json()
+
+    * trace_memory: tracemalloc adds considerable overhead to every
+      allocation, wall and cpu times are inflated while it is enabled
+    """
+    fields = ('wall', 'cpu', 'rows_in', 'rows_out', 'peak_bytes', 'blocks')
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.num_runs     = 0
+        self.steps        = {}          # {(step, command name): {field: [samples]}}
+
+    def execute_commands(self, flux, commands):
+        started_tracing = False
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+
+        try:
+            for step, command in enumerate(commands):
+                self.__execute_command(flux, step, command)
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+        self.num_runs += 1
+
+        return flux
+
+    def __execute_command(self, flux, step, command):
+        rows_in = flux.num_rows
+
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            mem_1, _ = tracemalloc.get_traced_memory()
+
+        blocks_1 = sys.getallocatedblocks()
+        cpu_1    = time.process_time()
+        wall_1   = time.perf_counter()
+
+        flux.execute_commands((command,))
+
+        wall_2   = time.perf_counter()
+        cpu_2    = time.process_time()
+        blocks_2 = sys.getallocatedblocks()
+
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            peak_bytes = peak - mem_1
+        else:
+            peak_bytes = None
+
+        key = (step, command_name(command))
+        if key not in self.steps:
+            self.steps[key] = {field: [] for field in self.fields}
+
+        samples = self.steps[key]
+        samples['wall'].append(wall_2 - wall_1)
+        samples['cpu'].append(cpu_2 - cpu_1)
+        samples['rows_in'].append(rows_in)
+        samples['rows_out'].append(flux.num_rows)
+        samples['peak_bytes'].append(peak_bytes)
+        samples['blocks'].append(blocks_2 - blocks_1)
+
+    def summary(self):
+        """ one dict per command, samples reduced to median (and max for timings) """
+        rows = []
+        for (step, name), samples in sorted(self.steps.items()):
+            row = {'step':    step,
+                   'command': name,
+                   'runs':    len(samples['wall'])}
+
+            for field in self.fields:
+                values = [v for v in samples[field] if v is not None]
+                row[field] = median(values) if values else None
+
+            row['wall_max'] = max(samples['wall'])
+            row['cpu_max']  = max(samples['cpu'])
+            rows.append(row)
+
+        return rows
+
+    def report(self):
+        headers = ('step', 'command', 'runs',
+                   'wall ms', 'wall max ms', 'cpu ms',
+                   'rows in', 'rows out',
+                   'peak KB', 'blocks')
+
+        m = [headers]
+        for row in self.summary():
+            peak_kb = '-' if row['peak_bytes'] is None else '{:,.1f}'.format(row['peak_bytes'] / 1024)
+
+            m.append((str(row['step']),
+                      row['command'],
+                      str(row['runs']),
+                      '{:,.3f}'.format(row['wall'] * 1000),
+                      '{:,.3f}'.format(row['wall_max'] * 1000),
+                      '{:,.3f}'.format(row['cpu'] * 1000),
+                      '{:,.0f}'.format(row['rows_in']),
+                      '{:,.0f}'.format(row['rows_out']),
+                      peak_kb,
+                      '{:,.0f}'.format(row['blocks'])))
+
+        widths = [max(len(row[c]) for row in m) for c in range(len(headers))]
+        lines  = ['  '.join(v.ljust(w) if c == 1 else v.rjust(w)
+                            for c, (v, w) in enumerate(zip(row, widths)))
+                  for row in m]
+        lines.insert(1, '-' * len(lines[0]))
+
+        return '\n'.join(lines)
+
+    def to_json(self, path=None, **kwargs):
+        kwargs['indent'] = kwargs.get('indent', 4)
+
+        d = {'num_runs': self.num_runs,
+             'commands': self.summary()}
+
+        if path is None:
+            return json.dumps(d, **kwargs)
+
+        with open(path, 'w') as f:
+            json.dump(d, f, **kwargs)
+
+    def print_report(self):
+        print()
+        print(self.report())
+
+    def clear(self):
+        self.num_runs = 0
+        self.steps.clear()
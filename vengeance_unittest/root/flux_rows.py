@@ -0,0 +1,308 @@
+"""
+chunked_rows_cls
+    * list-compatible row store made of blocks of rows, for matrices with
+      frequent inserts / deletes in the middle
+    * a python list moves every following reference on insert_rows(5, ...);
+      here only one block (of at most 2 * block_size rows) is shifted
+    * block sizes are kept in a fenwick tree over b = n / block_size blocks
+
+    cost, for n rows in b blocks
+        index access, locating a row                O(log b)
+        insert / delete inside a block              O(block_size + log b)
+        insert / delete that splits, adds or
+        removes a block (tree is rebuilt)           O(b + rows inserted)
+        sort, reverse, extended slices (step != 1)  O(n), the store is rebuilt
+        iteration                                   O(n), chains the blocks
+
+    flux_rows.use_chunked_rows(flux)
+    flux.matrix.insert(5, row)
+    flux.insert_rows(5, m)              (flux_cls inserts with matrix[i:i] = m)
+"""
+from collections.abc import MutableSequence
+from itertools import chain
+from itertools import islice
+
+default_block_size = 1_000
+
+
+class chunked_rows_cls(MutableSequence):
+
+    def __init__(self, rows=(), block_size=default_block_size):
+        self.block_size = block_size
+
+        rows = list(rows)
+        self._blocks = [rows[i:i + block_size] for i in range(0, len(rows), block_size)]
+        self._len    = len(rows)
+        self.__build_tree()
+
+    # region {fenwick tree over block sizes}
+    def __build_tree(self):
+        m    = len(self._blocks)
+        tree = [0] * (m + 1)
+        for i, block in enumerate(self._blocks, 1):
+            tree[i] += len(block)
+            j = i + (i & -i)
+            if j <= m:
+                tree[j] += tree[i]
+
+        self._tree = tree
+
+    def __update_tree(self, b_i, delta):
+        tree = self._tree
+        i = b_i + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def __locate(self, i):
+        """ row index -> (block index, offset in block) """
+        tree = self._tree
+        m    = len(tree) - 1
+        pos  = 0
+        step = 1 << m.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= m and tree[nxt] <= i:
+                pos = nxt
+                i  -= tree[nxt]
+            step >>= 1
+
+        return pos, i
+    # endregion
+
+    def __index(self, i):
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError('row index out of range')
+
+        return i
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._len)
+            if step == 1:
+                if start >= stop:
+                    return []
+                b_i, o_i = self.__locate(start)
+                it = chain(islice(self._blocks[b_i], o_i, None), *self._blocks[b_i + 1:])
+                return list(islice(it, stop - start))
+
+            return list(self)[i]
+
+        b_i, o_i = self.__locate(self.__index(i))
+        return self._blocks[b_i][o_i]
+
+    def __setitem__(self, i, row):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._len)
+            if step == 1:
+                # eg, flux.insert_rows(): matrix[i:i] = m, flux.sort(): matrix[1:] = sorted(...)
+                rows = list(row)
+                self.__delete_range(start, max(start, stop))
+                self.insert_rows(start, rows)
+                return
+
+            rows = list(self)
+            rows[i] = row
+            self.__reset(rows)
+            return
+
+        b_i, o_i = self.__locate(self.__index(i))
+        self._blocks[b_i][o_i] = row
+
+    def __delitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._len)
+            if step == 1:
+                self.__delete_range(start, stop)
+                return
+
+            rows = list(self)
+            del rows[i]
+            self.__reset(rows)
+            return
+
+        b_i, o_i = self.__locate(self.__index(i))
+        block = self._blocks[b_i]
+        del block[o_i]
+        self._len -= 1
+
+        if block:
+            self.__update_tree(b_i, -1)
+        else:
+            del self._blocks[b_i]
+            self.__build_tree()
+
+    def __delete_range(self, start, stop):
+        """ del self[start:stop]: partial blocks at either end are trimmed, whole blocks between are dropped """
+        if start >= stop:
+            return
+
+        b_1, o_1 = self.__locate(start)
+        if stop < self._len:
+            b_2, o_2 = self.__locate(stop)
+        else:
+            b_2, o_2 = len(self._blocks), 0
+
+        if b_1 == b_2:
+            block = self._blocks[b_1]
+            del block[o_1:o_2]
+            self._len -= stop - start
+
+            if block:
+                self.__update_tree(b_1, -(stop - start))
+            else:
+                del self._blocks[b_1]
+                self.__build_tree()
+            return
+
+        head = self._blocks[b_1][:o_1]
+        tail = self._blocks[b_2][o_2:] if b_2 < len(self._blocks) else []
+        if len(head) + len(tail) <= 2 * self.block_size:
+            remaining = [head + tail]
+        else:
+            remaining = [head, tail]
+
+        self._blocks[b_1:b_2 + 1] = [block for block in remaining if block]
+        self._len -= stop - start
+        self.__build_tree()
+
+    def insert(self, i, row):
+        if i < 0:
+            i = max(i + self._len, 0)
+        i = min(i, self._len)
+
+        if not self._blocks:
+            self._blocks.append([row])
+            self._len = 1
+            self.__build_tree()
+            return
+
+        if i == self._len:
+            b_i, o_i = len(self._blocks) - 1, len(self._blocks[-1])
+        else:
+            b_i, o_i = self.__locate(i)
+
+        block = self._blocks[b_i]
+        block.insert(o_i, row)
+        self._len += 1
+
+        if len(block) > 2 * self.block_size:
+            half = len(block) // 2
+            self._blocks[b_i:b_i + 1] = [block[:half], block[half:]]
+            self.__build_tree()
+        else:
+            self.__update_tree(b_i, 1)
+
+    def insert_rows(self, i, rows):
+        """ bulk insert: the target block is split, new rows become whole blocks """
+        rows = list(rows)
+        if not rows:
+            return
+
+        if i < 0:
+            i = max(i + self._len, 0)
+        i = min(i, self._len)
+
+        bs = self.block_size
+
+        if i == self._len:
+            b_i, o_i = len(self._blocks), 0
+        else:
+            b_i, o_i = self.__locate(i)
+
+        # small inserts go into the existing block, no new blocks or tree rebuild
+        if b_i == len(self._blocks) and self._blocks and len(self._blocks[-1]) + len(rows) <= 2 * bs:
+            self._blocks[-1].extend(rows)
+            self._len += len(rows)
+            self.__update_tree(b_i - 1, len(rows))
+            return
+
+        if b_i < len(self._blocks) and len(self._blocks[b_i]) + len(rows) <= 2 * bs:
+            self._blocks[b_i][o_i:o_i] = rows
+            self._len += len(rows)
+            self.__update_tree(b_i, len(rows))
+            return
+
+        new = [rows[r:r + bs] for r in range(0, len(rows), bs)]
+
+        if o_i:
+            block = self._blocks[b_i]
+            self._blocks[b_i:b_i + 1] = [block[:o_i]] + new + [block[o_i:]]
+        else:
+            self._blocks[b_i:b_i] = new
+
+        self._len += len(rows)
+        self.__build_tree()
+
+    def extend(self, rows):
+        self.insert_rows(self._len, rows)
+
+    def append(self, row):
+        self.insert(self._len, row)
+
+    def sort(self, key=None, reverse=False):
+        rows = list(self)
+        rows.sort(key=key, reverse=reverse)
+        self.__reset(rows)
+
+    def reverse(self):
+        self.__reset(list(reversed(self)))
+
+    def copy(self):
+        return chunked_rows_cls(self, self.block_size)
+
+    def __reset(self, rows):
+        bs = self.block_size
+        self._blocks = [rows[i:i + bs] for i in range(0, len(rows), bs)]
+        self._len    = len(rows)
+        self.__build_tree()
+
+    def __iter__(self):
+        return chain.from_iterable(self._blocks)
+
+    def __reversed__(self):
+        for block in reversed(self._blocks):
+            yield from reversed(block)
+
+    def __len__(self):
+        return self._len
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return 'chunked_rows_cls({:,} rows, {:,} blocks)'.format(self._len, len(self._blocks))
+
+
+def use_chunked_rows(flux, block_size=default_block_size):
+    """
+    swap flux.matrix (a python list) for a chunked_rows_cls
+
+    flux_cls methods that replace rows through slice assignment
+    (eg, insert_rows: matrix[i:i] = m, sort / filter: matrix[1:] = rows)
+    keep the chunked_rows_cls; only methods that assign a new list to
+    flux.matrix switch the flux back to a list
+    """
+    if not isinstance(flux.matrix, chunked_rows_cls):
+        flux.matrix = chunked_rows_cls(flux.matrix, block_size)
+
+    return flux
+
+
+def use_list_rows(flux):
+    if isinstance(flux.matrix, chunked_rows_cls):
+        flux.matrix = list(flux.matrix)
+
+    return flux
@@ -0,0 +1,130 @@
+"""
+top-k selection without a full sort
+    flux.sorted('col_a').matrix[1:101]  is O(n log n), plus a copy of the whole matrix
+    top_k(flux, 100, 'col_a')           is O(n log k), only the selected rows are copied
+
+    * same column and mixed-direction semantics as flux.sort(*columns, reverse=[...])
+    * ties keep their original order, same as a stable sort
+"""
+import heapq
+
+from operator import itemgetter
+
+from vengeance import flux_cls
+
+from root.examples.flux_columns import column_indices
+from root.examples.flux_columns import key_function
+
+
+class mixed_key_cls:
+    """ sort key where each column has its own direction; strings can't simply be negated """
+    __slots__ = ('values', 'reverse')
+
+    def __init__(self, values, reverse):
+        self.values  = values
+        self.reverse = reverse
+
+    def __lt__(self, other):
+        for a, b, r in zip(self.values, other.values, self.reverse):
+            if a == b:
+                continue
+            if r:
+                return b < a
+            return a < b
+
+        return False
+
+    def __eq__(self, other):
+        return self.values == other.values
+
+
+def __resolve_key(flux, columns, reverse):
+    """
+    returns (key function of a row, descending)
+
+    reverse is padded with False for each column, like flux.sort(): a scalar
+    reverse=True only reverses the first column
+    """
+    indices = column_indices(flux, columns or range(flux.num_cols))
+
+    if not isinstance(reverse, (list, tuple)):
+        reverse = [reverse]
+
+    reverse = [bool(r) for r in reverse]
+    reverse.extend([False] * (len(indices) - len(reverse)))
+
+    getter = itemgetter(*indices)
+
+    if all(reverse) or not any(reverse):
+        def key(row):
+            return getter(row.values)
+
+        return key, reverse[0]
+
+    if len(indices) == 1:
+        def key(row):
+            return mixed_key_cls((getter(row.values),), reverse)
+    else:
+        def key(row):
+            return mixed_key_cls(getter(row.values), reverse)
+
+    return key, False
+
+
+def __select(rows, k, key, descending):
+    if descending:
+        return heapq.nlargest(k, rows, key=key)
+
+    return heapq.nsmallest(k, rows, key=key)
+
+
+def __to_flux(flux, rows):
+    m = [flux.header_names()]
+    m.extend(list(row.values) for row in rows)
+
+    return flux_cls(m)
+
+
+def top_k(flux, k, *columns, reverse=False):
+    """
+    same rows as flux.sorted(*columns, reverse=reverse).matrix[1:k + 1], as a new flux_cls
+
+    :param reverse: bool (first column only, like flux.sort()), or a list of bools, one per column
+    """
+    key, descending = __resolve_key(flux, columns, reverse)
+    return __to_flux(flux, __select(flux, k, key, descending))
+
+
+def nlargest(flux, k, *columns):
+    """ every column descending """
+    return top_k(flux, k, *columns, reverse=[True] * (len(columns) or flux.num_cols))
+
+
+def nsmallest(flux, k, *columns):
+    return top_k(flux, k, *columns, reverse=False)
+
+
+def nth_value(flux, n, *columns, reverse=False):
+    """ n-th row (1-based) in sorted order, same as flux.sorted(*columns, reverse=reverse).matrix[n] """
+    if n < 1 or n > flux.num_rows:
+        raise IndexError('n out of range')
+
+    key, descending = __resolve_key(flux, columns, reverse)
+    return __select(flux, n, key, descending)[-1]
+
+
+def top_k_by_group(flux, k, group_by, *columns, reverse=False):
+    """
+    {group key: [rows]}, k rows per group, same key shape as .map_rows_append(group_by)
+
+    top_k_by_group(flux, 3, 'name', 'apples_sold', reverse=True)
+        3 rows with highest apples_sold for each name
+    """
+    key, descending = __resolve_key(flux, columns, reverse)
+    kf = key_function(flux, group_by)
+
+    groups = {}
+    for row in flux:
+        groups.setdefault(kf(row.values), []).append(row)
+
+    return {g: __select(rows, k, key, descending) for g, rows in groups.items()}
@@ -0,0 +1,520 @@
+"""
+sqlite-backed flux
+    * to_sqlite(): bulk load a flux (or any row iterable) into a local sqlite table,
+      executemany() in large transactions, column types inferred from the values
+    * sqlite_flux_cls: flux-like view of a table; filter / sort / unique / group_by /
+      map_rows are pushed down to sql, rows are read from a cursor on demand,
+      so lookups on tables larger than memory stay out-of-core
+    * flux_predicate expressions, eg col('name').startswith('a') & (col('apples_sold') >= 2),
+      are translated to sql where clauses
+    * connection_pool_cls: reusable connections, safe to share between threads;
+      a view holds a connection while it's being iterated, so lookups inside
+      a loop over a view need a pool size of at least 2
+    * in a ':memory:' (shared-cache) database, creating an index fails while another
+      connection has a cursor open, so map_rows() inside a loop over a view defers its
+      index until the loop is done; call create_index() before the loop to index those lookups
+
+    pool   = connection_pool_cls(share.files_dir + 'flux.db')
+    flux_s = to_sqlite(flux, pool, 'transactions', if_exists='replace')
+    flux_s.filter(col('apples_sold') >= 2)
+    flux_s.sort('name')
+    flux   = flux_s.to_flux()
+"""
+import sqlite3
+
+from contextlib import contextmanager
+from itertools import islice
+from operator import eq, ne, lt, le, gt, ge
+from queue import Queue
+
+from vengeance import flux_cls
+from vengeance.classes.flux_row_cls import flux_row_cls
+
+from root.examples.flux_predicate import predicate_cls
+
+sql_types = {int:   'INTEGER',
+             bool:  'INTEGER',
+             float: 'REAL',
+             str:   'TEXT',
+             bytes: 'BLOB'}
+
+sql_operators = {eq: 'IS',
+                 ne: 'IS NOT',
+                 lt: '<',
+                 le: '<=',
+                 gt: '>',
+                 ge: '>='}
+
+sql_aggregates = {'sum':   'SUM',
+                  'count': 'COUNT',
+                  'min':   'MIN',
+                  'max':   'MAX',
+                  'mean':  'AVG'}
+
+
+def quote(name):
+    return '"{}"'.format(str(name).replace('"', '""'))
+
+
+class connection_pool_cls:
+    """
+    :param path: database file, ':memory:' is opened as a shared-cache memory database
+                 so every pooled connection sees the same tables
+    """
+    __memory_ids = iter(range(1, 1_000_000_000))
+
+    def __init__(self, path, size=4, timeout=30.0):
+        uri = False
+        if path == ':memory:':
+            path = 'file:flux_memory_{}?mode=memory&cache=shared'.format(next(self.__memory_ids))
+            uri  = True
+
+        self.path         = path
+        self.size         = size
+        self.shared_cache = uri
+
+        self._idle = Queue()
+        for _ in range(size):
+            conn = sqlite3.connect(path,
+                                   timeout=timeout,
+                                   uri=uri,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """ blocks until a pooled connection is free """
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def in_use(self):
+        """ number of connections currently checked out """
+        return self.size - self._idle.qsize()
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return "connection_pool_cls('{}', {} connections)".format(self.path, self.size)
+
+
+def column_types(header_names, rows, sample=1_000):
+    """ sql type of each column from a sample of rows, no type (any affinity) for mixed columns """
+    types = [set() for _ in header_names]
+    for values in islice(rows, sample):
+        for t, v in zip(types, values):
+            if v is not None:
+                t.add(sql_types.get(type(v), ''))
+
+    return [t.pop() if len(t) == 1 else '' for t in types]
+
+
+def to_sqlite(flux, pool, table, if_exists='fail', chunk_size=100_000, header_names=None):
+    """
+    :param flux: flux_cls, or an iterable of primitive rows with header_names
+    :param if_exists: 'fail', 'replace' or 'append'
+    :param chunk_size: rows per executemany() call, the whole load is a single transaction
+    """
+    if if_exists not in ('fail', 'replace', 'append'):
+        raise ValueError("invalid if_exists: '{}', must be 'fail', 'replace' or 'append'".format(if_exists))
+
+    if isinstance(pool, str):
+        pool = connection_pool_cls(pool)
+
+    if header_names is None:
+        header_names = flux.header_names()
+        rows = flux.rows(1)
+    else:
+        rows = iter(flux)
+
+    first = list(islice(rows, chunk_size))
+    types = column_types(header_names, first)
+
+    columns = ', '.join('{} {}'.format(quote(h), t).rstrip() for h, t in zip(header_names, types))
+    insert  = 'INSERT INTO {} VALUES ({})'.format(quote(table), ', '.join('?' * len(header_names)))
+
+    with pool.connection() as conn:
+        conn.execute('BEGIN')
+        try:
+            if if_exists == 'replace':
+                conn.execute('DROP TABLE IF EXISTS {}'.format(quote(table)))
+            if if_exists == 'append':
+                conn.execute('CREATE TABLE IF NOT EXISTS {} ({})'.format(quote(table), columns))
+            else:
+                conn.execute('CREATE TABLE {} ({})'.format(quote(table), columns))
+
+            chunk = first
+            while chunk:
+                conn.executemany(insert, chunk)
+                chunk = list(islice(rows, chunk_size))
+
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    return sqlite_flux_cls(pool, table)
+
+
+def from_sqlite(pool, table):
+    if isinstance(pool, str):
+        pool = connection_pool_cls(pool)
+
+    return sqlite_flux_cls(pool, table)
+
+
+class sqlite_flux_cls:
+    """
+    lazy query over a sqlite table
+
+    * filter() and sort() modify the query in-place, like flux.filter() and flux.sort();
+      filtered() and sorted() return a new sqlite_flux_cls
+    * rows are read when iterated, to_flux() loads the result into a flux_cls
+    * filter() accepts flux_predicate expressions or a sql where clause with parameters;
+      plain python functions can only be used with filtered(), which evaluates them
+      row by row and returns an in-memory flux_cls
+    """
+
+    def __init__(self, pool, table, where=(), params=(), order_by=()):
+        self.pool  = pool
+        self.table = table
+
+        self._where    = list(where)
+        self._params   = list(params)
+        self._order_by = list(order_by)
+
+        with pool.connection() as conn:
+            cursor = conn.execute('SELECT * FROM {} LIMIT 0'.format(quote(table)))
+            self._header_names = [d[0] for d in cursor.description]
+
+        self.headers = {h: i for i, h in enumerate(self._header_names)}
+
+    def header_names(self):
+        return list(self._header_names)
+
+    # region {query building}
+    def __column(self, c):
+        if isinstance(c, int):
+            return quote(self._header_names[c])
+
+        if c not in self.headers:
+            raise ValueError("column '{}' not in headers".format(c))
+
+        return quote(c)
+
+    def __where_clause(self):
+        if not self._where:
+            return ''
+
+        return ' WHERE ' + ' AND '.join('({})'.format(w) for w in self._where)
+
+    def __order_clause(self):
+        if not self._order_by:
+            return ''
+
+        return ' ORDER BY ' + ', '.join(self._order_by)
+
+    def __select(self, select='*'):
+        return 'SELECT {} FROM {}{}'.format(select, quote(self.table), self.__where_clause())
+
+    def __execute(self, sql, params=()):
+        """ yields rows from a cursor, the pooled connection is held until the generator is exhausted or closed """
+        with self.pool.connection() as conn:
+            cursor = conn.execute(sql, params)
+            try:
+                while True:
+                    chunk = cursor.fetchmany(10_000)
+                    if not chunk:
+                        break
+
+                    yield from chunk
+            finally:
+                cursor.close()
+
+    def __copy(self):
+        return sqlite_flux_cls(self.pool, self.table, self._where, self._params, self._order_by)
+
+    def predicate_sql(self, predicate):
+        """ (sql, params) for a flux_predicate expression, TypeError if it can't be translated """
+        kind = predicate.kind
+        if kind in ('and', 'or'):
+            sql_a, params_a = self.predicate_sql(predicate.operand)
+            sql_b, params_b = self.predicate_sql(predicate.arg)
+            return '({} {} {})'.format(sql_a, kind.upper(), sql_b), params_a + params_b
+        if kind == 'not':
+            sql, params = self.predicate_sql(predicate.operand)
+            return '(NOT {})'.format(sql), params
+
+        c = self.__column(predicate.operand.column)
+        for t_kind, t_arg in predicate.operand.transforms:
+            if t_kind == 'len':
+                c = 'length({})'.format(c)
+            elif t_kind == 'item' and isinstance(t_arg, int) and t_arg >= 0:
+                c = 'substr({}, {}, 1)'.format(c, t_arg + 1)
+            else:
+                raise TypeError('column transform [{!r}] has no sql translation'.format(t_arg))
+
+        if kind == 'compare':
+            op, other = predicate.arg
+            return '{} {} ?'.format(c, sql_operators[op]), [other]
+        if kind == 'is_none':
+            return '{} IS NULL'.format(c), []
+        if kind == 'contains':
+            return 'instr({}, ?) > 0'.format(c), [predicate.arg]
+        if kind == 'isin':
+            values = list(predicate.arg)
+            return '{} IN ({})'.format(c, ', '.join('?' * len(values))), values
+        if kind == 'method':
+            name, s = predicate.arg.__reduce__()[1][:2]
+            if name == 'startswith':
+                return 'substr({}, 1, length(?)) = ?'.format(c), [s, s]
+            if name == 'endswith':
+                return 'substr({}, -length(?)) = ?'.format(c), [s, s]
+
+        raise TypeError('predicate {!r} has no sql translation'.format(predicate))
+    # endregion
+
+    # region {pushed down to sql}
+    def filter(self, predicate, params=()):
+        """
+        :param predicate: flux_predicate expression, or a sql where clause string with ? params
+        """
+        if isinstance(predicate, predicate_cls):
+            sql, params = self.predicate_sql(predicate)
+        elif isinstance(predicate, str):
+            sql = predicate
+        else:
+            raise TypeError('sqlite_flux_cls.filter() requires a flux_predicate expression or a '
+                            'sql string, use .filtered() to evaluate a python function')
+
+        self._where.append(sql)
+        self._params.extend(params)
+
+        return self
+
+    def filtered(self, predicate, params=()):
+        if callable(predicate) and not isinstance(predicate, predicate_cls):
+            m = [self.header_names()]
+            m.extend(row.values for row in self if predicate(row))
+            return flux_cls(m)
+
+        return self.__copy().filter(predicate, params)
+
+    def sort(self, *columns, reverse=False):
+        if not isinstance(reverse, (list, tuple)):
+            reverse = [reverse] * len(columns)
+
+        self._order_by = ['{} {}'.format(self.__column(c), 'DESC' if r else 'ASC')
+                          for c, r in zip(columns, reverse)]
+
+        return self
+
+    def sorted(self, *columns, reverse=False):
+        return self.__copy().sort(*columns, reverse=reverse)
+
+    def unique(self, *columns):
+        select = ', '.join(self.__column(c) for c in columns)
+        rows   = self.__execute(self.__select('DISTINCT ' + select), self._params)
+
+        if len(columns) == 1:
+            return [row[0] for row in rows]
+
+        return list(rows)
+
+    def group_by(self, *columns, **aggregates):
+        """
+        flux_s.group_by('name', apples_sold=('sum', 'apples_sold'), n=('count', 'name'))
+
+        aggregates: sum, count, min, max, mean
+        """
+        select = [self.__column(c) for c in columns]
+        for name, (agg, c) in aggregates.items():
+            if agg not in sql_aggregates:
+                raise ValueError("invalid aggregate: '{}', must be one of {}"
+                                 .format(agg, tuple(sql_aggregates)))
+
+            select.append('{}({}) AS {}'.format(sql_aggregates[agg], self.__column(c), quote(name)))
+
+        sql = self.__select(', '.join(select))
+        if columns:
+            sql += ' GROUP BY ' + ', '.join(self.__column(c) for c in columns)
+
+        m = [list(columns) + list(aggregates)]
+        m.extend(list(row) for row in self.__execute(sql, self._params))
+
+        return flux_cls(m)
+
+    def map_rows(self, *columns):
+        """ read-only mapping of key -> row, looked up in sql (an index is created on the columns) """
+        return sqlite_row_map_cls(self, columns, append=False)
+
+    def map_rows_append(self, *columns):
+        return sqlite_row_map_cls(self, columns, append=True)
+
+    def create_index(self, *columns):
+        """
+        returns False if the index could not be created yet: in a shared-cache database,
+        DDL raises 'database table is locked' while another connection has a cursor open
+        """
+        name = 'ix_{}_{}'.format(self.table, '_'.join(str(c) for c in columns))
+        sql  = 'CREATE INDEX IF NOT EXISTS {} ON {} ({})'.format(quote(name),
+                                                                 quote(self.table),
+                                                                 ', '.join(self.__column(c) for c in columns))
+        with self.pool.connection() as conn:
+            if self.pool.shared_cache and self.pool.in_use() > 1:
+                return False
+
+            try:
+                conn.execute(sql)
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                return False
+
+        return True
+
+    def _query(self, where=(), params=(), select='*', order=True):
+        """ rows of this view, with additional where clauses """
+        w   = self._where + list(where)
+        sql = 'SELECT {} FROM {}'.format(select, quote(self.table))
+        if w:
+            sql += ' WHERE ' + ' AND '.join('({})'.format(s) for s in w)
+        if order:
+            sql += self.__order_clause()
+
+        return self.__execute(sql, self._params + list(params))
+
+    def _column_sql(self, c):
+        return self.__column(c)
+    # endregion
+
+    def rows(self, r_1=0, r_2=None):
+        """
+        primitive rows, same indexing as flux_cls.rows(): r_1=0 includes the header row,
+        r_1=1 starts at the first data row, r_2 is exclusive
+        """
+        if r_1 == 0:
+            if r_2 is not None and r_2 <= 0:
+                return
+
+            yield self.header_names()
+            r_1 = 1
+
+        sql = self.__select() + self.__order_clause()
+        if r_2 is not None or r_1 > 1:
+            sql += ' LIMIT {} OFFSET {}'.format(-1 if r_2 is None else max(r_2 - r_1, 0), r_1 - 1)
+
+        for row in self.__execute(sql, self._params):
+            yield list(row)
+
+    def __iter__(self):
+        headers = self.headers
+        for values in self.rows(1):
+            yield flux_row_cls(headers, values)
+
+    def __getitem__(self, name):
+        c = self.__column(name)
+        return [row[0] for row in self.__execute(self.__select(c) + self.__order_clause(), self._params)]
+
+    def to_flux(self):
+        return flux_cls(list(self.rows()))
+
+    @property
+    def num_rows(self):
+        return next(self.__execute(self.__select('COUNT(*)'), self._params))[0]
+
+    @property
+    def num_cols(self):
+        return len(self._header_names)
+
+    def is_empty(self):
+        return next(self.__execute(self.__select('1') + ' LIMIT 1', self._params), None) is None
+
+    def __len__(self):
+        return self.num_rows
+
+    def __repr__(self):
+        return "sqlite_flux_cls('{}'{})".format(self.table, self.__where_clause())
+
+
+class sqlite_row_map_cls:
+    """
+    dict-like result of sqlite_flux_cls.map_rows(): each lookup is one indexed query
+
+    * like map_rows(), the last matching row wins (map_rows_append(): every matching row, as a list)
+    * keys are single values for one column, tuples for several
+    """
+
+    def __init__(self, flux_s, columns, append=False):
+        self.flux_s  = flux_s
+        self.columns = columns
+        self.append  = append
+
+        self._indexed = flux_s.create_index(*columns)
+        self._where   = ' AND '.join('{} IS ?'.format(flux_s._column_sql(c)) for c in columns)
+
+    def __ensure_index(self):
+        """ an index deferred by create_index() is created on the first lookup where it's possible """
+        if not self._indexed:
+            self._indexed = self.flux_s.create_index(*self.columns)
+
+    def __key_params(self, key):
+        if len(self.columns) == 1:
+            return [key]
+
+        return list(key)
+
+    def __lookup(self, key):
+        self.__ensure_index()
+
+        headers = self.flux_s.headers
+        rows    = self.flux_s._query([self._where], self.__key_params(key), select='*, rowid')
+
+        return [flux_row_cls(headers, list(row[:-1])) for row in sorted(rows, key=lambda r: r[-1])]
+
+    def get(self, key, default=None):
+        rows = self.__lookup(key)
+        if not rows:
+            return default
+
+        return rows if self.append else rows[-1]
+
+    def __getitem__(self, key):
+        rows = self.__lookup(key)
+        if not rows:
+            raise KeyError(key)
+
+        return rows if self.append else rows[-1]
+
+    def __contains__(self, key):
+        self.__ensure_index()
+
+        select = '1'
+        return next(self.flux_s._query([self._where], self.__key_params(key), select, order=False), None) is not None
+
+    def keys(self):
+        select = 'DISTINCT ' + ', '.join(self.flux_s._column_sql(c) for c in self.columns)
+        for row in self.flux_s._query(select=select, order=False):
+            yield row[0] if len(self.columns) == 1 else tuple(row)
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self):
+        return sum(1 for _ in self.keys())
+
+    def __repr__(self):
+        return 'sqlite_row_map_cls({})'.format(', '.join(map(str, self.columns)))
@@ -0,0 +1,298 @@
+"""
+asyncio streaming pipeline: source -> flux commands -> sinks
+    * a source is an async iterator of row batches (lists of primitive rows):
+      tail_file(), read_socket(), read_queue()
+    * each batch becomes a flux and runs the same command tuples as
+      flux_cls.execute_commands() (eg, flux_custom_cls.commands)
+    * commands run in an executor, so reading the next batch and writing
+      the previous one overlap with the current transformation
+    * bounded queues between the stages: a slow sink or slow commands
+      make the source wait instead of buffering the feed in memory
+    * a sink is any async callable taking the transformed flux:
+      csv_sink_cls, queue_sink(), chain_sink_cls
+
+    pipeline = stream_pipeline_cls(flux_custom_cls.commands,
+                                   flux_factory=lambda m: flux_custom_cls(m, 'apples'))
+    asyncio.run(pipeline.run(tail_file(path), csv_sink_cls(path_out)))
+"""
+import asyncio
+import csv
+import io
+import json
+
+from vengeance import flux_cls
+
+from root.examples.flux_chain import flux_chain_cls
+
+end_of_stream = object()
+
+
+# region {sources}
+async def tail_file(path, encoding='utf-8',
+                          batch_size=1_000,
+                          poll_interval=0.5,
+                          follow=True,
+                          parse=None):
+    """
+    yields batches of rows from a csv file, including rows appended to it later
+
+    * a line without a trailing newline is held until the writer completes it
+    * follow=False stops at the end of the file instead of waiting for new rows
+    * parse: function of one line -> row, csv by default
+    """
+    loop  = asyncio.get_running_loop()
+    parse = parse or __parse_csv_line
+
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        partial = ''
+        while True:
+            lines = await loop.run_in_executor(None, f.readlines, 64 * 1024)
+            if not lines:
+                if not follow:
+                    break
+
+                await asyncio.sleep(poll_interval)
+                continue
+
+            lines[0] = partial + lines[0]
+            partial  = ''
+            if not lines[-1].endswith('\n'):
+                partial = lines.pop()
+
+            rows = [parse(line) for line in lines if line.strip()]
+            for i in range(0, len(rows), batch_size):
+                yield rows[i:i + batch_size]
+
+        if partial.strip():
+            yield [parse(partial)]
+
+
+def __parse_csv_line(line):
+    return next(csv.reader(io.StringIO(line)))
+
+
+async def read_socket(host='127.0.0.1', port=8_000,
+                                        batch_size=1_000,
+                                        batch_timeout=0.1,
+                                        parse=json.loads):
+    """
+    yields batches of rows from a newline-delimited stream (one json list per line, by default)
+
+    a batch is yielded when it's full, or when no line arrives within batch_timeout
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        async for batch in __batched_lines(reader, batch_size, batch_timeout, parse):
+            yield batch
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def __batched_lines(reader, batch_size, batch_timeout, parse):
+    batch = []
+    while True:
+        try:
+            line = await asyncio.wait_for(reader.readline(), batch_timeout if batch else None)
+        except asyncio.TimeoutError:
+            yield batch
+            batch = []
+            continue
+
+        if not line:
+            break
+
+        if line.strip():
+            batch.append(parse(line))
+
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+async def read_queue(queue, batch_size=1_000):
+    """
+    yields batches of rows put into an asyncio.Queue, until end_of_stream is put
+
+    waits for one row, then takes whatever else is already queued, up to batch_size
+    """
+    while True:
+        row = await queue.get()
+        if row is end_of_stream:
+            break
+
+        batch = [row]
+        while len(batch) < batch_size and not queue.empty():
+            row = queue.get_nowait()
+            if row is end_of_stream:
+                yield batch
+                return
+
+            batch.append(row)
+
+        yield batch
+# endregion
+
+
+# region {sinks}
+class csv_sink_cls:
+    """ appends each transformed flux to a csv file, header row is written once """
+
+    def __init__(self, path, encoding='utf-8', mode='w', **kwargs):
+        self.path     = path
+        self.encoding = encoding
+        self.mode     = mode
+        self.kwargs   = kwargs
+
+        self._f      = None
+        self._writer = None
+
+    async def __call__(self, flux):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.__write, flux)
+
+    def __write(self, flux):
+        if self._f is None:
+            self._f      = open(self.path, self.mode, encoding=self.encoding, newline='')
+            self._writer = csv.writer(self._f, **self.kwargs)
+            self._writer.writerow(flux.header_names())
+
+        self._writer.writerows(flux.rows(1))
+        self._f.flush()
+
+    async def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+def queue_sink(queue):
+    """ puts each transformed flux into an asyncio.Queue, waiting if the queue is full """
+    async def sink(flux):
+        await queue.put(flux)
+
+    return sink
+
+
+class chain_sink_cls:
+    """ collects transformed batches into a flux_chain_cls, without copying rows """
+
+    def __init__(self):
+        self.chain = None
+
+    async def __call__(self, flux):
+        if self.chain is None:
+            self.chain = flux_chain_cls(flux)
+        else:
+            self.chain += flux
+
+    def to_flux(self):
+        return self.chain.to_flux() if self.chain is not None else flux_cls()
+# endregion
+
+
+class stream_pipeline_cls:
+    """
+    :param commands: command tuples, as passed to flux.execute_commands()
+    :param header_names: if None, the first row of the first batch is the header row
+    :param flux_factory: function of a matrix -> flux (eg, a flux_cls subclass that defines the commands)
+    :param maxsize: maximum batches waiting between each pair of stages
+    :param executor: concurrent.futures executor for the commands, default thread pool if None
+                     (commands hold the GIL, but source / sink I/O waits are overlapped)
+    """
+
+    def __init__(self, commands,
+                       header_names=None,
+                       flux_factory=flux_cls,
+                       maxsize=4,
+                       executor=None):
+
+        self.commands     = tuple(commands)
+        self.header_names = list(header_names) if header_names is not None else None
+        self.flux_factory = flux_factory
+        self.maxsize      = maxsize
+        self.executor     = executor
+
+        self.stats = {'batches':  0,
+                      'rows_in':  0,
+                      'rows_out': 0}
+
+    async def run(self, source, *sinks):
+        """ runs until source is exhausted and every batch has reached the sinks """
+        q_in  = asyncio.Queue(self.maxsize)
+        q_out = asyncio.Queue(self.maxsize)
+
+        tasks = [asyncio.ensure_future(self.__read(source, q_in)),
+                 asyncio.ensure_future(self.__transform(q_in, q_out)),
+                 asyncio.ensure_future(self.__write(q_out, sinks))]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            for sink in sinks:
+                close = getattr(sink, 'close', None)
+                if close is not None:
+                    await close()
+
+        return self.stats
+
+    async def __read(self, source, q_in):
+        async for batch in source:
+            if self.header_names is None:
+                if not batch:
+                    continue
+
+                self.header_names = list(batch[0])
+                batch = batch[1:]
+
+            if batch:
+                await q_in.put(batch)
+
+        await q_in.put(end_of_stream)
+
+    async def __transform(self, q_in, q_out):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = await q_in.get()
+            if batch is end_of_stream:
+                break
+
+            flux = await loop.run_in_executor(self.executor, self.execute_commands, batch)
+
+            self.stats['batches']  += 1
+            self.stats['rows_in']  += len(batch)
+            self.stats['rows_out'] += flux.num_rows
+
+            await q_out.put(flux)
+
+        await q_out.put(end_of_stream)
+
+    def execute_commands(self, batch):
+        flux = self.flux_factory([self.header_names] + batch)
+        if self.commands:
+            flux.execute_commands(self.commands)
+
+        return flux
+
+    async def __write(self, q_out, sinks):
+        while True:
+            flux = await q_out.get()
+            if flux is end_of_stream:
+                break
+
+            for sink in sinks:
+                await sink(flux)
+
+    def __repr__(self):
+        return 'stream_pipeline_cls({:,} commands, {:,} batches)'.format(len(self.commands),
+                                                                        self.stats['batches'])
@@ -0,0 +1,233 @@
+"""
+zero-copy row views
+    * flux.matrix[5:-5], flux.matrix[::3], zip(flux.matrix[1:], flux.matrix[2:])
+      each copy the list of row references, the offset idiom copies it twice
+    * row_view_cls only stores a range over the parent matrix, rows
+      are looked up on iteration / indexing
+    * indices are matrix indices (flux.matrix[0] is the header row),
+      start defaults to 1, like flux.rows(r_1=1); a view of a view takes
+      indices relative to the parent view, start defaults to 0
+    * enumerate_rows() / row_ids_cls: current and original row indices without
+      flux.label_row_indices() relabelling every row after a sort or filter
+"""
+from collections import deque
+from itertools import islice
+
+from vengeance import flux_cls
+
+
+def as_matrix(flux):
+    if isinstance(flux, (flux_cls, row_view_cls)):
+        return flux.matrix
+
+    return flux
+
+
+class row_view_cls:
+    """
+    for row in row_view_cls(flux, 5, -5):       # same rows as flux.matrix[5:-5]
+    for row in row_view_cls(flux, 0, None, 3):  # same rows as flux.matrix[::3]
+    for row in row_view_cls(view, 2, 4):        # same rows as view[2:4]
+
+    * bounds are resolved against the matrix (or parent view) length when the view is created
+    * slicing a view returns another view: view[::2]
+    * rows are shared with the parent flux, modifications are visible in both
+    * .matrix is the header row and the view's rows only, as a new list
+    * use .to_flux() when a separate flux_cls is needed
+
+    :param header_row: for a list of rows that has no header row at index 0
+    """
+
+    def __init__(self, flux, start=None, stop=None, step=1, header_row=None):
+        if isinstance(flux, row_view_cls):
+            self._matrix     = flux._matrix
+            self._header_row = flux._header_row
+            self._range      = flux._range[slice(start, stop, step)]
+            return
+
+        if start is None and header_row is None:
+            start = 1
+
+        self._matrix     = as_matrix(flux)
+        self._header_row = header_row
+        self._range      = range(*slice(start, stop, step).indices(len(self._matrix)))
+
+    @classmethod
+    def from_range(cls, matrix, r, header_row=None):
+        view = cls.__new__(cls)
+        view._matrix     = matrix
+        view._header_row = header_row
+        view._range      = r
+
+        return view
+
+    @property
+    def start(self):
+        return self._range.start
+
+    @property
+    def stop(self):
+        return self._range.stop
+
+    @property
+    def step(self):
+        return self._range.step
+
+    @property
+    def header_row(self):
+        if self._header_row is not None:
+            return self._header_row
+
+        return self._matrix[0] if self._matrix else None
+
+    @property
+    def headers(self):
+        header_row = self.header_row
+        return header_row.headers if header_row is not None else {}
+
+    def header_names(self):
+        header_row = self.header_row
+        return header_row.header_names() if header_row is not None else []
+
+    @property
+    def matrix(self):
+        """ header row + the view's rows, a new list for code that expects flux.matrix """
+        m = [] if self.header_row is None else [self.header_row]
+        m.extend(self)
+
+        return m
+
+    def rows(self):
+        """ rows as primitive values """
+        for row in self:
+            yield row.values
+
+    def indices(self):
+        """ indices into the parent matrix (not the parent view) """
+        return self._range
+
+    def to_flux(self):
+        m = [self.header_names()]
+        m.extend(self.rows())
+
+        return flux_cls(m)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return row_view_cls.from_range(self._matrix, self._range[i], self._header_row)
+
+        return self._matrix[self._range[i]]
+
+    def __iter__(self):
+        return map(self._matrix.__getitem__, self._range)
+
+    def __reversed__(self):
+        return map(self._matrix.__getitem__, reversed(self._range))
+
+    def __len__(self):
+        return len(self._range)
+
+    def __bool__(self):
+        return len(self._range) > 0
+
+    def __repr__(self):
+        return 'row_view_cls(matrix[{}:{}:{}], {:,} rows)'.format(self.start,
+                                                                 self.stop,
+                                                                 self.step,
+                                                                 len(self))
+
+
+def pairwise(flux, offset=1, start=1):
+    """
+    for row_1, row_2 in pairwise(flux):
+        same pairs as zip(flux.matrix[1:], flux.matrix[2:]), without copying
+
+    :param offset: distance between rows in each pair
+    """
+    if isinstance(flux, row_view_cls):
+        return zip(flux, flux[offset:])
+
+    m = as_matrix(flux)
+    return zip(islice(m, start, None), islice(m, start + offset, None))
+
+
+def window(flux, n, start=1):
+    """
+    for rows in window(flux, 3):
+        rows is a tuple of n consecutive rows: (row_1, row_2, row_3), (row_2, row_3, row_4), ...
+    """
+    if n < 1:
+        raise ValueError('window size must be at least 1')
+
+    if isinstance(flux, row_view_cls):
+        it = iter(flux)
+    else:
+        it = islice(as_matrix(flux), start, None)
+
+    w = deque(islice(it, n - 1), maxlen=n)
+    for row in it:
+        w.append(row)
+        yield tuple(w)
+
+
+def enumerate_rows(flux, start=1):
+    """
+    for r_i, row in enumerate_rows(flux):
+        r_i is the row's current matrix index, computed during iteration,
+        instead of stamping .r_i into every row with flux.label_row_indices()
+    """
+    if isinstance(flux, row_view_cls):
+        return zip(flux.indices(), flux)
+
+    m = as_matrix(flux)
+    return zip(range(start, len(m)), islice(m, start, None))
+
+
+class row_ids_cls:
+    """
+    stable original row ids that survive sort / filter without relabelling
+
+    ids = row_ids_cls(flux)           # snapshot of row references
+    flux.sort('col_b')
+    flux.filter(...)
+    for r_i, row in enumerate_rows(flux):
+        original_i = ids.original_index(row)
+
+    * construction is O(n): one copy of the list of row references (no per-row
+      python code), taken eagerly because the order must be captured before a sort
+    * the {id(row): original index} lookup, also O(n), is only built on first use
+    * rows are identified by object identity: flux.sort() / flux.filter() keep
+      the same row objects, flux.copy() creates new ones
+    """
+
+    def __init__(self, flux):
+        self.flux      = flux
+        self._original = list(as_matrix(flux))
+        self._ids      = None
+
+    def __lookup(self):
+        if self._ids is None:
+            self._ids = {id(row): r_i for r_i, row in enumerate(self._original)}
+
+        return self._ids
+
+    def original_index(self, row):
+        """ matrix index of row when the snapshot was taken, None for rows added since """
+        return self.__lookup().get(id(row))
+
+    def original_row(self, r_i):
+        return self._original[r_i]
+
+    def current_index(self, row):
+        """ O(n) scan for the row's current matrix index, meant for debugging """
+        for r_i, r in enumerate(as_matrix(self.flux)):
+            if r is row:
+                return r_i
+
+        return None
+
+    def labeled_rows(self, start=1):
+        """ (current index, original index, row) """
+        lookup = self.__lookup()
+        for r_i, row in enumerate_rows(self.flux, start):
+            yield r_i, lookup.get(id(row)), row
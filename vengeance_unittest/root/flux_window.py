@@ -0,0 +1,223 @@
+"""
+window functions over flux_cls columns
+    the flux alternative to
+        df.column1.diff().fillna(0).shift(-1)
+
+    * shift / lag / lead, diff, rolling and cumulative aggregates, rank
+    * partition_by: column(s) that split rows into independent groups,
+      rows keep their current order within each group (sort first if needed)
+    * every function computes its column in a single pass over the rows,
+      rolling aggregates are O(1) amortised per row, and the result is
+      assigned in place with flux[name] = values (appended if name is new)
+"""
+from collections import deque
+
+from root.examples.flux_columns import column_index
+from root.examples.flux_columns import key_function
+
+
+def shift(flux, column, n=1, name=None, fill=None, partition_by=None):
+    """
+    n > 0: value from n rows before (lag)
+    n < 0: value from n rows after  (lead)
+    """
+    c   = column_index(flux, column)
+    kf  = key_function(flux, partition_by)
+    out = [fill] * flux.num_rows
+
+    rows = list(enumerate(flux.rows(1)))
+    if n < 0:
+        rows.reverse()
+
+    n_abs  = abs(n)
+    states = {}
+    for i, values in rows:
+        k = kf(values)
+        q = states.get(k)
+        if q is None:
+            q = states[k] = deque(maxlen=n_abs or 1)
+
+        if n == 0:
+            out[i] = values[c]
+            continue
+
+        if len(q) == n_abs:
+            out[i] = q[0]
+        q.append(values[c])
+
+    flux[name or '{}_shift_{}'.format(flux.header_names()[c], n)] = out
+
+
+def lag(flux, column, n=1, name=None, fill=None, partition_by=None):
+    name = name or '{}_lag_{}'.format(flux.header_names()[column_index(flux, column)], n)
+    shift(flux, column, n, name, fill, partition_by)
+
+
+def lead(flux, column, n=1, name=None, fill=None, partition_by=None):
+    name = name or '{}_lead_{}'.format(flux.header_names()[column_index(flux, column)], n)
+    shift(flux, column, -n, name, fill, partition_by)
+
+
+def diff(flux, column, n=1, name=None, fill=None, partition_by=None):
+    """ value - value n rows before """
+    if n < 1:
+        raise ValueError('diff periods must be at least 1')
+
+    c   = column_index(flux, column)
+    kf  = key_function(flux, partition_by)
+    out = [fill] * flux.num_rows
+
+    states = {}
+    for i, values in enumerate(flux.rows(1)):
+        k = kf(values)
+        q = states.get(k)
+        if q is None:
+            q = states[k] = deque(maxlen=n)
+
+        v = values[c]
+        if len(q) == n:
+            out[i] = v - q[0]
+        q.append(v)
+
+    flux[name or '{}_diff_{}'.format(flux.header_names()[c], n)] = out
+
+
+def rolling(flux, column, n, agg='sum', name=None, fill=None, min_periods=None, partition_by=None):
+    """
+    :param agg:         'sum', 'mean', 'min' or 'max' over the last n rows (including current row)
+    :param min_periods: number of values required for a result, defaults to n (rows before that get fill)
+
+    sum / mean keep a running total (floating-point totals can accumulate rounding error),
+    min / max use a monotonic deque
+    """
+    if agg not in ('sum', 'mean', 'min', 'max'):
+        raise ValueError("invalid rolling aggregate: '{}'".format(agg))
+    if n < 1:
+        raise ValueError('window size must be at least 1')
+
+    if min_periods is None:
+        min_periods = n
+
+    c   = column_index(flux, column)
+    kf  = key_function(flux, partition_by)
+    out = [fill] * flux.num_rows
+
+    states = {}
+    for i, values in enumerate(flux.rows(1)):
+        k = kf(values)
+        state = states.get(k)
+        if state is None:
+            # [position in partition, window values, running total, monotonic deque]
+            state = states[k] = [0, deque(), 0, deque()]
+
+        v = values[c]
+        p, q, total, mono = state
+
+        if agg in ('sum', 'mean'):
+            q.append(v)
+            total += v
+            if len(q) > n:
+                total -= q.popleft()
+
+            state[2] = total
+            count    = len(q)
+            result   = total if agg == 'sum' else total / count
+        else:
+            if agg == 'min':
+                while mono and mono[-1][1] >= v:
+                    mono.pop()
+            else:
+                while mono and mono[-1][1] <= v:
+                    mono.pop()
+
+            mono.append((p, v))
+            if mono[0][0] <= p - n:
+                mono.popleft()
+
+            count  = min(p + 1, n)
+            result = mono[0][1]
+
+        state[0] = p + 1
+        if count >= min_periods:
+            out[i] = result
+
+    flux[name or '{}_rolling_{}_{}'.format(flux.header_names()[c], agg, n)] = out
+
+
+def cumulative(flux, column, agg='sum', name=None, partition_by=None):
+    """ :param agg: 'sum', 'count', 'mean', 'min' or 'max' of all rows up to and including current row """
+    if agg not in ('sum', 'count', 'mean', 'min', 'max'):
+        raise ValueError("invalid cumulative aggregate: '{}'".format(agg))
+
+    c   = column_index(flux, column)
+    kf  = key_function(flux, partition_by)
+    out = [None] * flux.num_rows
+
+    states = {}
+    for i, values in enumerate(flux.rows(1)):
+        k = kf(values)
+        v = values[c]
+
+        state = states.get(k)
+        if state is None:
+            state = states[k] = [0, 0, v, v]       # [count, total, min, max]
+
+        state[0] += 1
+        if agg == 'count':
+            out[i] = state[0]
+        elif agg in ('sum', 'mean'):
+            state[1] += v
+            out[i] = state[1] if agg == 'sum' else state[1] / state[0]
+        elif agg == 'min':
+            if v < state[2]:
+                state[2] = v
+            out[i] = state[2]
+        else:
+            if v > state[3]:
+                state[3] = v
+            out[i] = state[3]
+
+    flux[name or '{}_cum_{}'.format(flux.header_names()[c], agg)] = out
+
+
+def rank(flux, column, name=None, method='min', reverse=False, partition_by=None):
+    """
+    :param method:
+        'min':   tied values share the lowest rank, next rank skips (1, 2, 2, 4)
+        'dense': tied values share the lowest rank, no gaps         (1, 2, 2, 3)
+        'first': ties ranked by their order in flux                  (1, 2, 3, 4)
+    :param reverse: rank 1 is the largest value
+    """
+    if method not in ('min', 'dense', 'first'):
+        raise ValueError("invalid rank method: '{}'".format(method))
+
+    c   = column_index(flux, column)
+    kf  = key_function(flux, partition_by)
+    out = [None] * flux.num_rows
+
+    partitions = {}
+    for i, values in enumerate(flux.rows(1)):
+        partitions.setdefault(kf(values), []).append((values[c], i))
+
+    for items in partitions.values():
+        if reverse:
+            items.sort(key=lambda item: (item[0], -item[1]), reverse=True)
+        else:
+            items.sort()
+
+        r_dense = 0
+        v_prev  = object()
+        r_prev  = 0
+        for r, (v, i) in enumerate(items, 1):
+            if method == 'first':
+                out[i] = r
+                continue
+
+            if v != v_prev:
+                r_dense += 1
+                r_prev   = r
+                v_prev   = v
+
+            out[i] = r_prev if method == 'min' else r_dense
+
+    flux[name or '{}_rank'.format(flux.header_names()[c])] = out
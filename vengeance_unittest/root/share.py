@@ -1,6 +1,9 @@
 
 import os
+import sys
 
+from itertools import chain
+from itertools import islice
 from typing import Any
 import vengeance as vgc
 # from vengeance import open_workbook
@@ -21,13 +24,8 @@ if not os.path.exists(files_dir):
 
 
 def is_running_debug():
-    import inspect
-
-    for s_frame in reversed(inspect.stack()):
-        if s_frame.filename.endswith('pydevd.py'):
-            return True
-
-    return False
+    """ checking sys.modules is much cheaper than walking inspect.stack() for pydevd.py """
+    return 'pydevd' in sys.modules
 
 
 def resolve_profiler_function():
@@ -44,12 +42,18 @@ def resolve_profiler_function():
 
 
 def print_profiler(profiler):
+    from root.examples import flux_instrument
+
     try:
         if profiler.functions:
             profiler.print_stats()
     except AttributeError:
         pass
 
+    if flux_instrument.enabled:
+        print()
+        print(flux_instrument.report())
+
 
 # noinspection PyTypeChecker,DuplicatedCode
 def random_matrix(num_rows=100,
@@ -206,20 +210,36 @@ def worksheet_to_flux(ws, *,
 def write_to_worksheet(ws, m, *,
                        r_1='*h',
                        c_1=None,
-                       c_2=None):
-
+                       c_2=None,
+                       chunk_size=50_000):
+    """
+    r_1='*a' appends below the existing rows: only the first row of m is
+    read to check for a header row, the rest is written in chunks of
+    chunk_size rows, so m is never copied into a single tuple
+    """
     from vengeance.util.iter import is_header_row
 
     lev = worksheet_to_lev(ws, c_1=c_1, c_2=c_2)
     lev.activate()
 
     if r_1 == '*a' and not lev.is_empty:
-        m = tuple(m)
-        if is_header_row(m[0], lev.header_names()):
-            m = m[1:]
-    else:
-        lev.clear('*f %s:*l *l' % r_1)
+        rows  = iter(m)
+        first = next(rows, None)
+        if first is None:
+            return
+
+        if not is_header_row(first, lev.header_names()):
+            rows = chain((first,), rows)
+
+        chunk = tuple(islice(rows, chunk_size))
+        while chunk:
+            lev['*f *a'] = chunk                # re-reads the boundaries (and reapplies a filter), *a moves below
+
+            chunk = tuple(islice(rows, chunk_size))
+
+        return
 
+    lev.clear('*f %s:*l *l' % r_1)
     lev['*f %s' % r_1] = m
 
 